@@ -0,0 +1,66 @@
+import functools
+import hashlib
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+def get_version(key):
+    """Valeur courante d'un compteur de version partagé dans le cache"""
+    version = cache.get(key)
+    if version is None:
+        # Valeur initiale horodatée : une clé évincée ne réutilise pas une ancienne version
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+def bump_version(key):
+    """Incrémente un compteur de version après le commit de la transaction en cours"""
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+def _generation_key(user_id):
+    return f'cache:generation:{user_id}'
+
+def get_user_generation(user_id):
+    """Génération courante des données d'un utilisateur"""
+    return get_version(_generation_key(user_id))
+
+def bump_user_generation(user_id):
+    """Invalide toutes les données en cache d'un utilisateur (après commit)"""
+    bump_version(_generation_key(user_id))
+
+def response_cache_key(view_action, request, kwargs):
+    """Clé d'une réponse : action, utilisateur, génération, jour, arguments d'URL et paramètres"""
+    user_id = request.user.pk
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    digest = hashlib.md5(repr((sorted(kwargs.items()), params)).encode()).hexdigest()
+    return (
+        f'cache:{view_action}:{user_id}:{get_user_generation(user_id)}'
+        f':{timezone.now().date().isoformat()}:{digest}'
+    )
+
+def cached_per_user(view_action, ttl):
+    """
+    Met en cache les réponses 200 d'une action de viewset en lecture, par
+    utilisateur. Toute modification de ses produits, stocks ou listes de
+    courses change sa génération et invalide ses réponses en cache.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            key = response_cache_key(view_action, request, kwargs)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, ttl)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,26 @@
+import math
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+
+class FiniteFloatField(serializers.FloatField):
+    """
+    FloatField qui refuse NaN et les infinis, en entrée comme en sortie.
+    FastJSONRenderer ne les détecte pas (orjson les rend null) : tout champ
+    flottant d'un serializer de l'API doit utiliser ce champ.
+    """
+    default_error_messages = {
+        'non_finite': _('A finite number is required.'),
+    }
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        if not math.isfinite(value):
+            self.fail('non_finite')
+        return value
+
+    def to_representation(self, value):
+        value = super().to_representation(value)
+        if not math.isfinite(value):
+            # Même comportement que le JSONRenderer strict de DRF
+            raise ValueError(f'Valeur flottante non finie : {value!r}')
+        return value
@@ -0,0 +1,104 @@
+import io
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from apps.core.parsers import FastJSONParser
+from apps.core.renderers import FastJSONRenderer, orjson
+from apps.products.models import Category, Location, Product
+from apps.stocks.models import StockBatch
+from apps.stocks.serializers import StockBatchSerializer
+
+User = get_user_model()
+
+class _Rollback(Exception):
+    """Annule le jeu de données synthétique en fin de benchmark"""
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark du rendu et de la lecture JSON : JSONRenderer/JSONParser de DRF '
+        'contre FastJSONRenderer/FastJSONParser sur une liste de lots sérialisés'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batches', type=int, default=1000, help='Nombre de lots sérialisés')
+        parser.add_argument('--repeat', type=int, default=50, help='Exécutions par mesure')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson absent : FastJSONRenderer utilise le module json'))
+        try:
+            with transaction.atomic():
+                data = self._payload(options)
+                self._report(data, options)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS('✓ Jeu de données synthétique supprimé'))
+
+    def _payload(self, options):
+        stamp = int(time.time())
+        today = timezone.localdate()
+        user = User.objects.create_user(
+            username=f'bench_json_{stamp}', email=f'bench_json_{stamp}@saneo.local', password=None
+        )
+        category, _ = Category.objects.get_or_create(name='autre')
+        location = Location.objects.create(user=user, name='placard', description='Placard')
+        products = Product.objects.bulk_create([
+            Product(user=user, name=f'Produit {i}', category=category) for i in range(50)
+        ])
+        StockBatch.objects.bulk_create([
+            StockBatch(
+                product=products[i % len(products)],
+                location=location,
+                quantity=Decimal(i % 7) + Decimal('0.25'),
+                expiry_date=today + timedelta(days=i % 90),
+                purchase_date=today,
+                purchase_price=Decimal(i % 13) + Decimal('0.99'),
+                supplier='Marché',
+                notes=f'Lot {i}'
+            )
+            for i in range(options['batches'])
+        ])
+
+        batches = StockBatch.objects.filter(product__user=user).select_related('product', 'location')
+        started = time.perf_counter()
+        data = StockBatchSerializer(batches, many=True).data
+        self.stdout.write(
+            f'Sérialisation de {len(data)} lots : {(time.perf_counter() - started) * 1000:.1f}ms'
+        )
+        return data
+
+    def _measure(self, func, options):
+        durations = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - started)
+        return statistics.median(durations) * 1000
+
+    def _report(self, data, options):
+        expected = JSONRenderer().render(data)
+        if FastJSONRenderer().render(data) != expected:
+            raise CommandError('Rendu différent de JSONRenderer')
+        self.stdout.write(f'Taille de la réponse : {len(expected) / 1024:.1f} Ko (identique)')
+
+        def parse(parser):
+            return lambda: parser.parse(io.BytesIO(expected), 'application/json', {'encoding': 'utf-8'})
+
+        rows = [
+            ('Rendu', self._measure(lambda: JSONRenderer().render(data), options),
+             self._measure(lambda: FastJSONRenderer().render(data), options)),
+            ('Lecture', self._measure(parse(JSONParser()), options),
+             self._measure(parse(FastJSONParser()), options)),
+        ]
+
+        self.stdout.write('')
+        self.stdout.write(f'{"":<10} {"json":>10} {"orjson":>10} {"gain":>8}')
+        for label, before, after in rows:
+            self.stdout.write(f'{label:<10} {before:>8.2f}ms {after:>8.2f}ms {before / after:>7.1f}x')
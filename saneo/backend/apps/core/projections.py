@@ -0,0 +1,54 @@
+from django.utils.encoding import force_str
+from rest_framework.response import Response
+
+def choice_labels(model, field_name):
+    """Libellés d'un champ à choix, tels que renvoyés par get_FOO_display()"""
+    field = model._meta.get_field(field_name)
+    return {value: force_str(label, strings_only=True) for value, label in field.flatchoices}
+
+class ValuesProjection:
+    """
+    Représentation en lecture seule d'un serializer calculée sur des lignes
+    values() : ni instances de modèle, ni résolution des `source=` pointés
+    champ par champ. Le JSON produit est identique à celui du serializer ;
+    les décimaux et les dates passent par les champs du serializer.
+    """
+    serializer_class = None
+    # Colonnes lues par values(), jointures comprises
+    fields = ()
+
+    def __init__(self):
+        self.serializer_fields = self.serializer_class().fields
+
+    def nullable(self, name):
+        """to_representation du champ `name`, None restant None comme dans le serializer"""
+        to_representation = self.serializer_fields[name].to_representation
+        return lambda value: None if value is None else to_representation(value)
+
+    def values(self, queryset):
+        return queryset.values(*self.fields)
+
+    def project(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+class ProjectionMixin:
+    """
+    Sert la liste (et les actions en lecture qui l'appellent) d'un viewset
+    depuis `projection_class`, sur le queryset filtré et paginé habituel.
+    """
+    projection_class = None
+
+    def projected_response(self, queryset, paginate=False):
+        projection = self.projection_class()
+        rows = projection.values(queryset)
+        if paginate:
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(projection.project(page))
+        return Response(projection.project(rows))
+
+    def list(self, request, *args, **kwargs):
+        return self.projected_response(self.filter_queryset(self.get_queryset()), paginate=True)
@@ -0,0 +1,40 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    orjson = None
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Rendu JSON via orjson quand il est installé, octet pour octet identique
+    au JSONRenderer de DRF pour la sortie des serializers. Les dates et
+    heures passent par l'encodeur DRF (suffixe « Z » en UTC), les Decimal
+    aussi ; le rendu indenté (API navigable, `indent=` dans l'en-tête
+    Accept) et les valeurs qu'orjson refuse (entiers de plus de 64 bits...)
+    repassent par le module json. Différences : un flottant en notation
+    exponentielle s'écrit 1e16 au lieu de 1e+16 (même valeur JSON), et
+    NaN ou un infini serait rendu null au lieu de lever ValueError. Ces
+    valeurs sont refusées là où elles sont produites (FiniteFloatField,
+    FastJSONParser) : le rendu ne parcourt pas les données.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Échappement de \u2028 et \u2029, comme JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
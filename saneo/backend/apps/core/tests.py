@@ -0,0 +1,101 @@
+import io
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from apps.core.fields import FiniteFloatField
+from apps.core.parsers import FastJSONParser
+from apps.core.renderers import FastJSONRenderer
+from apps.products.models import Category, Location, Product
+from apps.stocks.models import StockBatch
+from apps.stocks.serializers import StockBatchSerializer
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assertSameRendering(self, data, accepted_media_type=None, renderer_context=None):
+        expected = JSONRenderer().render(data, accepted_media_type, renderer_context)
+        self.assertEqual(FastJSONRenderer().render(data, accepted_media_type, renderer_context), expected)
+
+    def test_matches_drf_renderer_for_python_types(self):
+        self.assertSameRendering({
+            'aware_utc': datetime(2026, 3, 1, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'aware_paris': datetime(2026, 3, 1, 8, 30, tzinfo=ZoneInfo('Europe/Paris')),
+            'naive': datetime(2026, 3, 1, 8, 30),
+            'day': date(2026, 3, 1),
+            'hour': time(8, 30, 15),
+            'delay': timedelta(hours=1, seconds=5),
+            'quantity': Decimal('1.50'),
+            'ratio': 0.1,
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Utilisateur'),
+            'text': 'Crème brûlée\u2028ligne\u2029',
+            1: [None, True, False, (1, 2)],
+        })
+
+    def test_floats(self):
+        self.assertSameRendering({'values': [0.1, -2.5, 1e15, 123456.789, None]})
+        # Notation exponentielle : même valeur, écriture différente
+        self.assertEqual(FastJSONRenderer().render([1e16, 1e-07]), b'[1e16,1e-7]')
+        self.assertEqual(JSONRenderer().render([1e16, 1e-07]), b'[1e+16,1e-07]')
+
+    def test_falls_back_to_json_module(self):
+        self.assertSameRendering({'big': 2 ** 70})
+        self.assertSameRendering({'a': [1, 2]}, 'application/json; indent=4')
+        self.assertSameRendering({'a': [1, 2]}, renderer_context={'indent': 2})
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONRendererSerializerTests(TestCase):
+    def test_matches_drf_renderer_for_stock_batches(self):
+        user = get_user_model().objects.create_user(
+            username='renderer_tester', email='renderer_tester@example.com', password='StrongPass123!'
+        )
+        category = Category.objects.create(name='nourriture')
+        location = Location.objects.create(user=user, name='placard', description='Placard')
+        product = Product.objects.create(user=user, name='Pâtes « test »', category=category)
+        StockBatch.objects.create(
+            product=product, quantity=Decimal('2.50'), location=location,
+            expiry_date=date(2030, 1, 1), purchase_price=Decimal('3.10'), notes='Achat promo'
+        )
+        StockBatch.objects.create(product=product, quantity=Decimal('1'))
+
+        data = StockBatchSerializer(
+            StockBatch.objects.select_related('product', 'location'), many=True
+        ).data
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class FastJSONParserTests(SimpleTestCase):
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {'encoding': 'utf-8'})
+
+    def test_matches_drf_parser(self):
+        body = '{"quantity": 1.5, "note": "Crème", "ids": [1, 2], "ok": true, "none": null}'.encode()
+        self.assertEqual(self.parse(FastJSONParser(), body), self.parse(JSONParser(), body))
+
+    def test_rejects_invalid_json_and_constants(self):
+        for body in (b'{"a": ', b'{"a": NaN}', b'{"a": Infinity}'):
+            with self.assertRaises(ParseError):
+                self.parse(FastJSONParser(), body)
+
+
+class FiniteFloatFieldTests(SimpleTestCase):
+    def test_rejects_non_finite_values_in_both_directions(self):
+        field = FiniteFloatField()
+        self.assertEqual(field.run_validation('1.5'), 1.5)
+        self.assertEqual(field.to_representation(1e16), 1e16)
+
+        for value in ('nan', 'inf', '-inf', float('nan')):
+            with self.assertRaises(ValidationError):
+                field.run_validation(value)
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                field.to_representation(value)
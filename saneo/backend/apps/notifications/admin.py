@@ -0,0 +1,16 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboxMessage
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['recipient', 'subject', 'delivered', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['delivered', 'created_at']
+    search_fields = ['recipient', 'subject', 'user__username']
+    readonly_fields = ['delivered_at', 'attempts', 'last_error', 'created_at']
+    
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        queryset.filter(delivered=False).update(attempts=0, next_attempt_at=timezone.now())
+    retry_now.short_description = "Relancer l'envoi"
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+class OutboxMessageManager(models.Manager):
+    def enqueue(self, user, subject, body):
+        """Place un email dans la file d'envoi ; la livraison est faite par deliver_outbox"""
+        return self.create(
+            user=user,
+            recipient=user.email,
+            subject=subject,
+            body=body
+        )
+    
+    def pending(self, now=None):
+        """Messages à (re)tenter maintenant"""
+        return self.filter(
+            delivered=False,
+            next_attempt_at__lte=now or timezone.now(),
+            attempts__lt=settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS
+        )
+
+class OutboxMessage(models.Model):
+    """Email en attente d'envoi (file d'envoi des notifications)"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='outbox_messages',
+        verbose_name="Utilisateur"
+    )
+    recipient = models.EmailField(verbose_name="Destinataire")
+    subject = models.CharField(max_length=255, verbose_name="Sujet")
+    body = models.TextField(verbose_name="Message")
+    
+    delivered = models.BooleanField(default=False, verbose_name="Envoyé")
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name="Date d'envoi")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentatives")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Prochaine tentative")
+    last_error = models.TextField(blank=True, verbose_name="Dernière erreur")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = OutboxMessageManager()
+    
+    class Meta:
+        verbose_name = "Email en file d'envoi"
+        verbose_name_plural = "Emails en file d'envoi"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(delivered=False),
+                name='notif_outbox_pending'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.recipient} - {self.subject}"
+    
+    def mark_failed(self, error, now):
+        """Reporte le message avec un délai doublé à chaque tentative"""
+        self.attempts += 1
+        self.last_error = str(error)
+        self.next_attempt_at = now + timedelta(
+            seconds=settings.NOTIFICATION_OUTBOX_RETRY_DELAY * 2 ** (self.attempts - 1)
+        )
@@ -0,0 +1,89 @@
+import logging
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+def _claim(started_at, chunk_size):
+    """
+    Réserve un paquet de messages dans une transaction courte : leur prochaine
+    tentative est repoussée de NOTIFICATION_OUTBOX_LEASE, ce qui les retire de
+    la file pour les autres passages (et pour la suite de celui-ci).
+    """
+    with transaction.atomic():
+        # Les messages reportés pendant ce passage ne sont pas repris (next_attempt_at > started_at)
+        messages = list(
+            OutboxMessage.objects.pending(started_at).select_for_update(
+                skip_locked=True
+            ).order_by('next_attempt_at', 'id')[:chunk_size]
+        )
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+                next_attempt_at=timezone.now() + timedelta(seconds=settings.NOTIFICATION_OUTBOX_LEASE)
+            )
+    return messages
+
+@shared_task
+def deliver_outbox(chunk_size=None):
+    """
+    Envoie les emails en attente par paquets, sur une seule connexion SMTP.
+    Les envois ont lieu hors transaction et chaque résultat est enregistré
+    aussitôt : un échec en base après un envoi ne fait pas repartir les
+    emails déjà livrés.
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_OUTBOX_CHUNK_SIZE
+    started_at = timezone.now()
+    delivered = failed = 0
+    
+    if not OutboxMessage.objects.pending(started_at).exists():
+        return "Aucun email en attente"
+    
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Serveur indisponible : les messages restent en file pour le prochain passage
+        return f"Connexion impossible au serveur d'envoi: {str(e)}"
+    
+    try:
+        while True:
+            messages = _claim(started_at, chunk_size)
+            if not messages:
+                break
+            
+            for message in messages:
+                email = EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[message.recipient],
+                    connection=connection
+                )
+                try:
+                    connection.send_messages([email])
+                except Exception as e:
+                    message.mark_failed(e, timezone.now())
+                    message.save(update_fields=['attempts', 'next_attempt_at', 'last_error'])
+                    failed += 1
+                    if message.attempts >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS:
+                        logger.error(
+                            "Email %s abandonné après %s tentatives (%s) : %s",
+                            message.pk, message.attempts, message.recipient, message.last_error
+                        )
+                else:
+                    OutboxMessage.objects.filter(pk=message.pk).update(
+                        delivered=True,
+                        delivered_at=timezone.now(),
+                        attempts=F('attempts') + 1
+                    )
+                    delivered += 1
+    finally:
+        connection.close()
+    
+    return f"{delivered} email(s) envoyé(s), {failed} en échec"
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.notifications.models import OutboxMessage
+from apps.notifications.tasks import deliver_outbox
+
+
+class FlakyEmailBackend(EmailBackend):
+    """Backend de test qui refuse les destinataires contenant « refus »"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if any('refus' in recipient for recipient in message.to):
+                raise ConnectionError('Destinataire refusé')
+        return super().send_messages(messages)
+
+
+class OutboxDeliveryTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.users = [
+            user_model.objects.create_user(
+                username=f'outbox_{name}',
+                email=f'{name}@example.com',
+                password='StrongPass123!'
+            )
+            for name in ('alice', 'bruno', 'refus')
+        ]
+        for user in self.users:
+            OutboxMessage.objects.enqueue(user, f'Sujet {user.username}', 'Bonjour')
+
+    def test_pending_messages_are_sent_over_a_single_connection(self):
+        with mock.patch('apps.notifications.tasks.get_connection', wraps=get_connection) as connect:
+            result = deliver_outbox(chunk_size=2)
+
+        connect.assert_called_once()
+        self.assertEqual(result, '3 email(s) envoyé(s), 0 en échec')
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['alice@example.com', 'bruno@example.com', 'refus@example.com']
+        )
+        self.assertEqual(OutboxMessage.objects.filter(delivered=True).count(), 3)
+
+    @override_settings(EMAIL_BACKEND='apps.notifications.tests.FlakyEmailBackend')
+    def test_failed_message_is_retried_with_backoff(self):
+        deliver_outbox()
+
+        failed = OutboxMessage.objects.get(recipient='refus@example.com')
+        self.assertFalse(failed.delivered)
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.last_error, 'Destinataire refusé')
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(len(mail.outbox), 2)
+
+        # Pas de nouvelle tentative avant l'échéance
+        self.assertEqual(deliver_outbox(), 'Aucun email en attente')
+
+        OutboxMessage.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        deliver_outbox()
+        failed.refresh_from_db()
+        self.assertEqual(failed.attempts, 2)
+        self.assertGreater(failed.next_attempt_at, timezone.now() + timedelta(seconds=110))
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_BACKEND='apps.notifications.tests.FlakyEmailBackend', NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2)
+    def test_exhausted_message_is_logged(self):
+        OutboxMessage.objects.filter(recipient='refus@example.com').update(attempts=1)
+
+        with self.assertLogs('apps.notifications.tasks', level='ERROR') as logs:
+            deliver_outbox()
+
+        self.assertIn('abandonné après 2 tentatives', logs.output[0])
+        OutboxMessage.objects.filter(recipient='refus@example.com').update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_outbox(), 'Aucun email en attente')
+
+    def test_delivered_messages_stay_delivered_when_a_later_send_fails(self):
+        sent = []
+
+        def send_then_crash(messages):
+            if sent:
+                raise RuntimeError('Worker interrompu')
+            sent.extend(messages)
+            return 1
+
+        with mock.patch.object(EmailBackend, 'send_messages', side_effect=send_then_crash):
+            with mock.patch('apps.notifications.tasks.OutboxMessage.mark_failed', side_effect=RuntimeError):
+                with self.assertRaises(RuntimeError):
+                    deliver_outbox()
+
+        # Le premier message est enregistré comme livré, les autres restent réservés
+        self.assertEqual(OutboxMessage.objects.filter(delivered=True).count(), 1)
+        self.assertFalse(OutboxMessage.objects.pending().exists())
@@ -1,4 +1,6 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 class Category(models.Model):
@@ -52,6 +54,32 @@ class Location(models.Model):
     def __str__(self):
         return f"{self.get_name_display()} - {self.user.username}"
 
+class ProductQuerySet(models.QuerySet):
+    """QuerySet des produits avec annotations de stock"""
+
+    def with_stock(self):
+        """
+        Annote le stock total et les indicateurs de réapprovisionnement
+        (current_stock, below_threshold, restock_needed) en une seule requête,
+        à partir du niveau de stock maintenu (ProductStockLevel).
+        """
+        return self.annotate(
+            current_stock=Coalesce(
+                models.F('stock_level__quantity'),
+                models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            )
+        ).annotate(
+            below_threshold=models.ExpressionWrapper(
+                models.Q(current_stock__lt=models.F('threshold')),
+                output_field=models.BooleanField()
+            ),
+            restock_needed=models.ExpressionWrapper(
+                models.Q(current_stock=0) | models.Q(current_stock__lt=models.F('threshold')),
+                output_field=models.BooleanField()
+            )
+        )
+
 class Product(models.Model):
     """Produits du catalogue"""
     UNIT_CHOICES = [
@@ -91,6 +119,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
@@ -103,17 +133,23 @@ class Product(models.Model):
     @property
     def total_stock(self):
         """Calcule le stock total de ce produit"""
-        from apps.stocks.models import StockBatch
-        return StockBatch.objects.filter(product=self).aggregate(
-            total=models.Sum('quantity')
-        )['total'] or 0
+        if hasattr(self, 'current_stock'):
+            return self.current_stock
+        from apps.stocks.models import ProductStockLevel
+        return ProductStockLevel.objects.filter(product=self).values_list(
+            'quantity', flat=True
+        ).first() or 0
     
     @property
     def is_below_threshold(self):
         """Vérifie si le stock est en dessous du seuil"""
+        if hasattr(self, 'below_threshold'):
+            return self.below_threshold
         return self.total_stock < self.threshold
     
     @property
     def needs_restock(self):
         """Vérifie si le produit doit être racheté"""
+        if hasattr(self, 'restock_needed'):
+            return self.restock_needed
         return self.total_stock == 0 or self.is_below_threshold
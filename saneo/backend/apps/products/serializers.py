@@ -11,7 +11,14 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_product_count(self, obj):
-        return obj.products.count()
+        # Produits de l'utilisateur courant (annotation des vues, sinon une requête)
+        if hasattr(obj, 'product_count'):
+            return obj.product_count
+        request = self.context.get('request')
+        products = obj.products.all()
+        if request is not None:
+            products = products.filter(user=request.user)
+        return products.count()
 
 class LocationSerializer(serializers.ModelSerializer):
     name_display = serializers.CharField(source='get_name_display', read_only=True)
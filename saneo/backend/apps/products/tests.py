@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.products.models import Category, Location, Product
+from apps.stocks.models import StockBatch
+
+
+class ProductStockAnnotationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='product_tester',
+            email='product_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+        self.location = Location.objects.create(user=self.user, name='placard', description='Placard test')
+
+        self.in_stock = self._create_product('Riz test', threshold='1.00', quantities=['2.00', '1.50'])
+        self.low_stock = self._create_product('Farine test', threshold='3.00', quantities=['1.00'])
+        self.out_of_stock = self._create_product('Sucre test', threshold='1.00', quantities=[])
+
+    def _create_product(self, name, threshold, quantities):
+        product = Product.objects.create(
+            user=self.user,
+            name=name,
+            category=self.category,
+            default_location=self.location,
+            threshold=Decimal(threshold),
+        )
+        for quantity in quantities:
+            StockBatch.objects.create(
+                product=product,
+                quantity=Decimal(quantity),
+                location=self.location,
+            )
+        return product
+
+    def test_with_stock_annotates_totals_and_flags(self):
+        products = {p.pk: p for p in Product.objects.filter(user=self.user).with_stock()}
+
+        self.assertEqual(products[self.in_stock.pk].total_stock, Decimal('3.50'))
+        self.assertFalse(products[self.in_stock.pk].needs_restock)
+        self.assertTrue(products[self.low_stock.pk].is_below_threshold)
+        self.assertEqual(products[self.out_of_stock.pk].total_stock, Decimal('0'))
+        self.assertTrue(products[self.out_of_stock.pk].needs_restock)
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/products/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        stocks = {row['name']: row['total_stock'] for row in response.data['results']}
+        self.assertEqual(stocks['Riz test'], '3.50')
+        self.assertEqual(stocks['Sucre test'], '0.00')
+
+    def test_restock_actions_filter_in_database(self):
+        response = self.client.get('/api/v1/products/to_restock/')
+        self.assertEqual(
+            sorted(row['name'] for row in response.data),
+            ['Farine test', 'Sucre test']
+        )
+
+        response = self.client.get('/api/v1/products/low_stock/')
+        self.assertEqual([row['name'] for row in response.data], ['Farine test'])
+
+        response = self.client.get('/api/v1/products/out_of_stock/')
+        self.assertEqual([row['name'] for row in response.data], ['Sucre test'])
+
+    def test_by_category_query_count_does_not_depend_on_category_count(self):
+        other = Category.objects.create(name='menage')
+        Product.objects.create(user=self.user, name='Savon test', category=other)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/products/by_category/')
+
+        self.assertEqual(
+            [(group['category']['name'], [row['name'] for row in group['products']]) for group in response.data],
+            [
+                ('menage', ['Savon test']),
+                ('nourriture', ['Farine test', 'Riz test', 'Sucre test']),
+            ]
+        )
+
+    def test_by_category_counts_only_the_user_products(self):
+        other_user = get_user_model().objects.create_user(
+            username='product_other', email='product_other@example.com', password='StrongPass123!'
+        )
+        response = self.client.get('/api/v1/products/by_category/')
+        self.assertEqual(response.data[0]['category']['product_count'], 3)
+
+        # Un produit d'un autre utilisateur ne change pas la réponse en cache
+        Product.objects.create(user=other_user, name='Riz autre', category=self.category)
+        self.assertEqual(self.client.get('/api/v1/products/by_category/').data, response.data)
+        cache.clear()
+        self.assertEqual(self.client.get('/api/v1/products/by_category/').data, response.data)
+
+    def test_category_endpoints_agree_on_product_count(self):
+        other_user = get_user_model().objects.create_user(
+            username='category_other', email='category_other@example.com', password='StrongPass123!'
+        )
+        Product.objects.create(user=other_user, name='Riz autre', category=self.category)
+
+        grouped = self.client.get('/api/v1/products/by_category/').data
+        categories = self.client.get('/api/v1/products/categories/', {'search': 'nourriture'}).data
+        self.assertEqual(categories['results'][0]['product_count'], 3)
+        self.assertEqual(grouped[0]['category']['product_count'], 3)
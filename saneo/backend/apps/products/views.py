@@ -4,7 +4,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from decimal import Decimal, InvalidOperation
-from django.db import transaction
+from itertools import groupby
+from django.db.models import Count, Q
+from apps.core.cache import cached_per_user
 from .models import Category, Location, Product
 from .serializers import (
     CategorySerializer, LocationSerializer, 
@@ -16,11 +18,16 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet pour les catégories (lecture seule)
     """
-    queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
+    
+    def get_queryset(self):
+        # Nombre de produits de l'utilisateur, comme dans ProductViewSet.by_category
+        return Category.objects.annotate(
+            product_count=Count('products', filter=Q(products__user=self.request.user))
+        )
 
 class LocationViewSet(viewsets.ModelViewSet):
     """
@@ -49,7 +56,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Product.objects.filter(user=self.request.user).select_related(
             'category', 'default_location'
-        )
+        ).with_stock()
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -61,22 +68,21 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def to_restock(self, request):
         """Liste des produits à racheter"""
-        products = self.get_queryset().filter(
-            auto_add_to_list=True
+        to_restock = self.get_queryset().filter(
+            auto_add_to_list=True,
+            restock_needed=True
         )
         
-        # Filtrer ceux qui sont en dessous du seuil
-        to_restock = [p for p in products if p.needs_restock]
-        
         serializer = ProductListSerializer(to_restock, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
         """Liste des produits en stock faible (mais pas à zéro)"""
-        products = self.get_queryset()
-        
-        low_stock = [p for p in products if p.is_below_threshold and p.total_stock > 0]
+        low_stock = self.get_queryset().filter(
+            below_threshold=True,
+            current_stock__gt=0
+        )
         
         serializer = ProductListSerializer(low_stock, many=True)
         return Response(serializer.data)
@@ -84,26 +90,28 @@ class ProductViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def out_of_stock(self, request):
         """Liste des produits en rupture de stock"""
-        products = self.get_queryset()
-        
-        out_of_stock = [p for p in products if p.total_stock == 0]
+        out_of_stock = self.get_queryset().filter(current_stock=0)
         
         serializer = ProductListSerializer(out_of_stock, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_per_user('products:by_category', ttl=15 * 60)
     def by_category(self, request):
-        """Produits groupés par catégorie"""
-        categories = Category.objects.all()
-        result = []
+        """Produits de l'utilisateur groupés par catégorie"""
+        # Une seule requête triée par catégorie, regroupée en mémoire
+        products = self.get_queryset().order_by('category__name', 'category_id', 'name')
         
-        for category in categories:
-            products = self.get_queryset().filter(category=category)
-            if products.exists():
-                result.append({
-                    'category': CategorySerializer(category).data,
-                    'products': ProductListSerializer(products, many=True).data
-                })
+        result = []
+        for _, group in groupby(products, key=lambda product: product.category_id):
+            group = list(group)
+            category = group[0].category
+            # Nombre de produits de l'utilisateur : la réponse ne dépend que de ses données
+            category.product_count = len(group)
+            result.append({
+                'category': CategorySerializer(category).data,
+                'products': ProductListSerializer(group, many=True).data
+            })
         
         return Response(result)
     
@@ -153,51 +161,27 @@ class ProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        from apps.stocks.models import StockBatch, StockMovement
+        from apps.stocks.models import InsufficientStockError
+        from apps.stocks.services import consume_fefo
 
-        batches = StockBatch.objects.filter(
-            product=product,
-            quantity__gt=0
-        )
+        note = request.data.get('note', 'Consommation rapide depuis produits')
 
-        total_available = sum(batch.quantity for batch in batches)
-        if quantity_to_consume > total_available:
+        try:
+            movements, remaining = consume_fefo(
+                product,
+                quantity_to_consume,
+                user=request.user,
+                note=note
+            )
+        except InsufficientStockError as e:
             return Response(
-                {'error': f'Quantité insuffisante. Disponible: {total_available}'},
+                {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        note = request.data.get('note', 'Consommation rapide depuis produits')
-        remaining_to_consume = quantity_to_consume
-        movements_created = 0
-
-        expiring_batches = batches.filter(
-            expiry_date__isnull=False
-        ).order_by('expiry_date', 'purchase_date', 'id')
-        non_expiring_batches = batches.filter(
-            expiry_date__isnull=True
-        ).order_by('purchase_date', 'id')
-
-        with transaction.atomic():
-            for batch in list(expiring_batches) + list(non_expiring_batches):
-                if remaining_to_consume <= 0:
-                    break
-
-                consumed = min(batch.quantity, remaining_to_consume)
-                StockMovement.objects.create(
-                    product=product,
-                    batch=batch,
-                    type='OUT',
-                    quantity=consumed,
-                    user=request.user,
-                    note=note
-                )
-                remaining_to_consume -= consumed
-                movements_created += 1
-
         return Response({
             'message': 'Consommation enregistrée',
             'consumed': quantity_to_consume,
-            'remaining_total_stock': product.total_stock,
-            'movements_created': movements_created
+            'remaining_total_stock': remaining,
+            'movements_created': len(movements)
         })
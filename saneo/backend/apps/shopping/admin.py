@@ -17,6 +17,9 @@ class ShoppingListAdmin(admin.ModelAdmin):
     readonly_fields = ['total_items', 'checked_items', 'completion_percentage', 'created_at', 'updated_at']
     inlines = [ShoppingListItemInline]
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user').with_totals()
+    
     fieldsets = [
         ('Informations', {
             'fields': ('user', 'title', 'status', 'is_auto_generated')
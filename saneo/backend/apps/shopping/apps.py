@@ -4,3 +4,6 @@ class ShoppingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.shopping'
     verbose_name = 'Liste de courses'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
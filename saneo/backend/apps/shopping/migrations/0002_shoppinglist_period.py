@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopping', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='period',
+            field=models.CharField(blank=True, editable=False, max_length=7, null=True, verbose_name='Période'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(condition=models.Q(('period__isnull', False)), fields=('user', 'period'), name='shopping_list_unique_period'),
+        ),
+    ]
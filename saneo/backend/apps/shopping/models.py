@@ -2,6 +2,20 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
+class ShoppingListQuerySet(models.QuerySet):
+    """QuerySet des listes de courses avec compteurs d'articles"""
+    
+    def with_totals(self):
+        """
+        Annote le nombre d'articles, d'articles cochés et le coût estimé
+        (items_total, items_checked, items_cost) en une seule requête.
+        """
+        return self.annotate(
+            items_total=models.Count('items'),
+            items_checked=models.Count('items', filter=models.Q(items__is_checked=True)),
+            items_cost=models.Sum('items__estimated_cost')
+        )
+
 class ShoppingList(models.Model):
     """Liste de courses"""
     STATUS_CHOICES = [
@@ -15,16 +29,27 @@ class ShoppingList(models.Model):
     title = models.CharField(max_length=200, default="Liste de courses", verbose_name="Titre")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name="Statut")
     is_auto_generated = models.BooleanField(default=False, verbose_name="Générée automatiquement")
+    # Mois (AAAA-MM) des listes mensuelles : une seule par utilisateur et par mois
+    period = models.CharField(max_length=7, null=True, blank=True, editable=False, verbose_name="Période")
     notes = models.TextField(blank=True, verbose_name="Notes")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name="Date de finalisation")
     
+    objects = ShoppingListQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Liste de courses"
         verbose_name_plural = "Listes de courses"
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'period'],
+                condition=models.Q(period__isnull=False),
+                name='shopping_list_unique_period'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username} ({self.get_status_display()})"
@@ -32,23 +57,30 @@ class ShoppingList(models.Model):
     @property
     def total_items(self):
         """Nombre total d'items dans la liste"""
+        if hasattr(self, 'items_total'):
+            return self.items_total
         return self.items.count()
     
     @property
     def checked_items(self):
         """Nombre d'items cochés"""
+        if hasattr(self, 'items_checked'):
+            return self.items_checked
         return self.items.filter(is_checked=True).count()
     
     @property
     def completion_percentage(self):
         """Pourcentage de complétion"""
-        if self.total_items == 0:
+        total_items = self.total_items
+        if total_items == 0:
             return 0
-        return int((self.checked_items / self.total_items) * 100)
+        return int((self.checked_items / total_items) * 100)
     
     @property
     def estimated_total_cost(self):
         """Coût total estimé"""
+        if hasattr(self, 'items_cost'):
+            return self.items_cost or 0
         from django.db.models import Sum
         return self.items.aggregate(
             total=Sum('estimated_cost')
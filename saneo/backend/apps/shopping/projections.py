@@ -0,0 +1,52 @@
+from apps.core.projections import ValuesProjection, choice_labels
+from apps.products.models import Category, Product
+from .models import ShoppingListItem
+from .serializers import ShoppingListItemSerializer
+
+class ShoppingListItemProjection(ValuesProjection):
+    """Projection de ShoppingListItemSerializer"""
+    serializer_class = ShoppingListItemSerializer
+    fields = (
+        'id', 'product_id', 'product__name', 'product__unit', 'product__category__name',
+        'suggested_quantity', 'actual_quantity', 'priority', 'reason', 'estimated_cost',
+        'actual_cost', 'is_checked', 'notes', 'created_at', 'updated_at'
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.units = choice_labels(Product, 'unit')
+        self.categories = choice_labels(Category, 'name')
+        self.priorities = choice_labels(ShoppingListItem, 'priority')
+        self.reasons = choice_labels(ShoppingListItem, 'reason')
+        fields = self.serializer_fields
+        self.suggested_quantity = fields['suggested_quantity'].to_representation
+        self.actual_quantity = self.nullable('actual_quantity')
+        self.estimated_cost = self.nullable('estimated_cost')
+        self.actual_cost = self.nullable('actual_cost')
+        self.created_at = fields['created_at'].to_representation
+        self.updated_at = fields['updated_at'].to_representation
+
+    def to_representation(self, row):
+        unit = row['product__unit']
+        category = row['product__category__name']
+        priority = row['priority']
+        reason = row['reason']
+        return {
+            'id': row['id'],
+            'product': row['product_id'],
+            'product_name': row['product__name'],
+            'product_unit': self.units.get(unit, unit),
+            'category_name': self.categories.get(category, category),
+            'suggested_quantity': self.suggested_quantity(row['suggested_quantity']),
+            'actual_quantity': self.actual_quantity(row['actual_quantity']),
+            'priority': priority,
+            'priority_display': self.priorities.get(priority, priority),
+            'reason': reason,
+            'reason_display': self.reasons.get(reason, reason),
+            'estimated_cost': self.estimated_cost(row['estimated_cost']),
+            'actual_cost': self.actual_cost(row['actual_cost']),
+            'is_checked': row['is_checked'],
+            'notes': row['notes'],
+            'created_at': self.created_at(row['created_at']),
+            'updated_at': self.updated_at(row['updated_at']),
+        }
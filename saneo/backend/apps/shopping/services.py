@@ -0,0 +1,109 @@
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from apps.core.cache import bump_user_generation
+from apps.products.models import Product
+from .models import ShoppingList, ShoppingListItem
+
+def build_restock_items(user):
+    """
+    Articles à acheter pour un utilisateur : produits en rupture de stock
+    ou sous le seuil, calculés en une seule requête annotée.
+    Retourne des ShoppingListItem non enregistrés (sans liste).
+    """
+    products = Product.objects.filter(
+        user=user,
+        auto_add_to_list=True
+    ).with_stock().filter(restock_needed=True).order_by('pk').only('pk', 'threshold')
+    
+    items = []
+    for product in products:
+        current_stock = product.current_stock
+        threshold = product.threshold
+        
+        # Produit en rupture de stock
+        if current_stock == 0:
+            items.append(ShoppingListItem(
+                product=product,
+                suggested_quantity=threshold,
+                priority='urgent',
+                reason='out_of_stock'
+            ))
+        
+        # Produit sous le seuil
+        else:
+            items.append(ShoppingListItem(
+                product=product,
+                suggested_quantity=threshold - current_stock,
+                priority='high' if current_stock < (threshold * Decimal('0.3')) else 'normal',
+                reason='below_threshold'
+            ))
+    return items
+
+def generate_shopping_list(user, title, period=None):
+    """
+    Génère une liste de courses automatique avec ses articles créés en masse.
+    Retourne (liste, articles), ou (None, []) s'il n'y a rien à acheter :
+    aucune liste vide n'est créée. Avec `period` (AAAA-MM), une liste déjà
+    générée pour ce mois lève IntegrityError.
+    """
+    items = build_restock_items(user)
+    if not items:
+        return None, []
+    
+    with transaction.atomic():
+        shopping_list = ShoppingList.objects.create(
+            user=user,
+            title=title,
+            status='active',
+            is_auto_generated=True,
+            period=period
+        )
+        for item in items:
+            item.shopping_list = shopping_list
+        ShoppingListItem.objects.bulk_create(items)
+    return shopping_list, items
+
+def regenerate_shopping_list(shopping_list):
+    """
+    Met à jour une liste automatique existante d'après les besoins actuels :
+    ajoute les nouveaux articles, met à jour la quantité suggérée et la
+    priorité des articles modifiés et retire les articles devenus inutiles.
+    Les articles cochés ou ajoutés manuellement ne sont jamais modifiés.
+    Retourne les compteurs {'added', 'updated', 'removed'}.
+    """
+    needs = {item.product_id: item for item in build_restock_items(shopping_list.user_id)}
+    
+    now = timezone.now()
+    with transaction.atomic():
+        existing = list(shopping_list.items.select_for_update())
+        existing_products = {item.product_id for item in existing}
+        
+        to_update = []
+        to_remove = []
+        for item in existing:
+            if item.is_checked or item.reason == 'manual':
+                continue
+            need = needs.get(item.product_id)
+            if need is None:
+                to_remove.append(item.pk)
+            elif (item.suggested_quantity, item.priority, item.reason) != (
+                need.suggested_quantity, need.priority, need.reason
+            ):
+                item.suggested_quantity = need.suggested_quantity
+                item.priority = need.priority
+                item.reason = need.reason
+                item.updated_at = now
+                to_update.append(item)
+        
+        to_add = [need for product_id, need in needs.items() if product_id not in existing_products]
+        for item in to_add:
+            item.shopping_list = shopping_list
+        
+        ShoppingListItem.objects.filter(pk__in=to_remove).delete()
+        ShoppingListItem.objects.bulk_update(to_update, ['suggested_quantity', 'priority', 'reason', 'updated_at'])
+        ShoppingListItem.objects.bulk_create(to_add)
+        # bulk_update et bulk_create ne déclenchent pas les signaux d'invalidation
+        bump_user_generation(shopping_list.user_id)
+    
+    return {'added': len(to_add), 'updated': len(to_update), 'removed': len(to_remove)}
@@ -0,0 +1,22 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.core.cache import bump_user_generation
+from .models import ShoppingList, ShoppingListItem
+
+@receiver([post_save, post_delete], sender=ShoppingList)
+def invalidate_cache_on_shopping_list_change(sender, instance, **kwargs):
+    bump_user_generation(instance.user_id)
+
+@receiver([post_save, post_delete], sender=ShoppingListItem)
+def invalidate_cache_on_shopping_item_change(sender, instance, origin=None, **kwargs):
+    # Suppression en cascade (liste, utilisateur) : la liste invalide déjà le cache
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and origin_model is not ShoppingListItem:
+        return
+    if sender.shopping_list.is_cached(instance):
+        user_id = instance.shopping_list.user_id
+    else:
+        user_id = ShoppingList.objects.filter(pk=instance.shopping_list_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        bump_user_generation(user_id)
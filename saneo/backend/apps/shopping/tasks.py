@@ -1,68 +1,113 @@
-from celery import shared_task
-from django.utils import timezone
-from django.core.mail import send_mail
+import logging
+from collections import defaultdict
+from datetime import datetime
+from celery import chord, shared_task
 from django.conf import settings
-from decimal import Decimal
+from django.db import DatabaseError, IntegrityError
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
 from .models import ShoppingList, ShoppingListItem
-from apps.products.models import Product
+from .services import generate_shopping_list
+from apps.notifications.models import OutboxMessage
 from apps.users.models import User
 
+logger = logging.getLogger(__name__)
+
 @shared_task
-def generate_monthly_shopping_list():
+def generate_monthly_shopping_list(period=None):
     """
     Tâche mensuelle pour générer automatiquement une liste de courses
-    pour tous les utilisateurs actifs
+    pour tous les utilisateurs actifs.
+    
+    Les utilisateurs sont répartis en lots traités en parallèle (chord),
+    étalés sur SHOPPING_MONTHLY_SPREAD_SECONDS ; un résumé est produit
+    à la fin. Relancer la tâche pour le même mois ne traite que les
+    utilisateurs sans liste pour ce mois.
     """
-    users = User.objects.filter(is_active=True)
-    lists_created = 0
+    period = period or timezone.localdate().strftime('%Y-%m')
+    user_ids = list(User.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+    if not user_ids:
+        return "0 listes de courses créées"
     
-    for user in users:
-        # Créer la liste
-        shopping_list = ShoppingList.objects.create(
-            user=user,
-            title=f"Liste mensuelle - {timezone.now().strftime('%B %Y')}",
-            status='active',
-            is_auto_generated=True
+    chunk_size = settings.SHOPPING_MONTHLY_CHUNK_SIZE
+    chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+    spread = settings.SHOPPING_MONTHLY_SPREAD_SECONDS
+    
+    header = [
+        generate_monthly_shopping_list_chunk.s(chunk, period).set(
+            countdown=int(spread * index / len(chunks))
         )
+        for index, chunk in enumerate(chunks)
+    ]
+    chord(header)(summarize_monthly_shopping_lists.s(period))
+    
+    return f"{len(chunks)} lot(s) planifié(s) pour {len(user_ids)} utilisateurs ({period})"
+
+@shared_task
+def generate_monthly_shopping_list_chunk(user_ids, period):
+    """
+    Génère les listes mensuelles d'un lot d'utilisateurs.
+    Les utilisateurs ayant déjà une liste pour ce mois sont ignorés.
+    """
+    title = f"Liste mensuelle - {datetime.strptime(period, '%Y-%m').strftime('%B %Y')}"
+    # Utilisateurs désactivés depuis la planification : ni traités ni comptés
+    users = list(
+        User.objects.filter(pk__in=user_ids, is_active=True).annotate(
+            has_list=Exists(ShoppingList.objects.filter(user=OuterRef('pk'), period=period))
+        )
+    )
+    summary = {
+        'lists_created': 0,
+        'nothing_to_buy': 0,
+        'already_done': sum(user.has_list for user in users),
+        'failed': [],
+    }
+    
+    for user in users:
+        if user.has_list:
+            continue
+        try:
+            shopping_list, items = generate_shopping_list(user, title=title, period=period)
+        except IntegrityError:
+            # Liste créée entre-temps par une autre exécution
+            summary['already_done'] += 1
+            continue
+        except DatabaseError:
+            # Une erreur de base sur un utilisateur ne bloque pas le reste du lot
+            logger.exception("Échec de la liste mensuelle %s pour l'utilisateur %s", period, user.pk)
+            summary['failed'].append(user.pk)
+            continue
         
-        products = Product.objects.filter(user=user, auto_add_to_list=True)
-        items_created = 0
-        
-        for product in products:
-            current_stock = product.total_stock
-            threshold = product.threshold
-            
-            # Produit en rupture de stock
-            if current_stock == 0:
-                ShoppingListItem.objects.create(
-                    shopping_list=shopping_list,
-                    product=product,
-                    suggested_quantity=threshold,
-                    priority='urgent',
-                    reason='out_of_stock'
-                )
-                items_created += 1
-            
-            # Produit sous le seuil
-            elif current_stock < threshold:
-                quantity_needed = threshold - current_stock
-                ShoppingListItem.objects.create(
-                    shopping_list=shopping_list,
-                    product=product,
-                    suggested_quantity=quantity_needed,
-                    priority='high' if current_stock < (threshold * Decimal('0.3')) else 'normal',
-                    reason='below_threshold'
-                )
-                items_created += 1
+        if not items:
+            summary['nothing_to_buy'] += 1
+            continue
         
         # Envoyer email de notification
-        if items_created > 0 and user.notification_email and user.email:
+        if user.notification_email and user.email:
             send_shopping_list_email.delay(user.id, shopping_list.id)
         
-        if items_created > 0:
-            lists_created += 1
+        summary['lists_created'] += 1
+    
+    return summary
+
+@shared_task
+def summarize_monthly_shopping_lists(results, period):
+    """Résumé de la génération mensuelle (callback du chord)"""
+    lists_created = sum(result['lists_created'] for result in results)
+    nothing_to_buy = sum(result['nothing_to_buy'] for result in results)
+    already_done = sum(result['already_done'] for result in results)
+    failed = [user_id for result in results for user_id in result['failed']]
     
-    return f"{lists_created} listes de courses créées"
+    message = (
+        f"{lists_created} listes de courses créées ({period}), "
+        f"{nothing_to_buy} sans besoin, {already_done} déjà générées, {len(failed)} en échec"
+    )
+    if failed:
+        logger.warning("%s - utilisateurs en échec : %s", message, failed)
+    else:
+        logger.info(message)
+    return message
 
 @shared_task
 def send_shopping_list_email(user_id, shopping_list_id):
@@ -70,49 +115,41 @@ def send_shopping_list_email(user_id, shopping_list_id):
     Envoyer un email pour notifier de la création d'une liste de courses
     """
     try:
-        user = User.objects.get(id=user_id)
-        shopping_list = ShoppingList.objects.get(id=shopping_list_id)
-        
-        subject = f"SANEO - Nouvelle liste de courses : {shopping_list.title}"
-        
-        message = f"Bonjour {user.first_name or user.username},\n\n"
-        message += f"Une nouvelle liste de courses a été générée automatiquement : {shopping_list.title}\n\n"
-        message += f"Elle contient {shopping_list.total_items} article(s) :\n\n"
+        # Une seule requête : articles, produits, liste et utilisateur
+        items = list(
+            ShoppingListItem.objects.filter(
+                shopping_list_id=shopping_list_id,
+                shopping_list__user_id=user_id
+            ).select_related('product', 'shopping_list__user')
+        )
+        if items:
+            shopping_list = items[0].shopping_list
+        else:
+            shopping_list = ShoppingList.objects.select_related('user').get(id=shopping_list_id, user_id=user_id)
+        user = shopping_list.user
         
         # Lister les items par priorité
-        urgent_items = shopping_list.items.filter(priority='urgent')
-        high_items = shopping_list.items.filter(priority='high')
-        normal_items = shopping_list.items.filter(priority='normal')
-        
-        if urgent_items.exists():
-            message += "🔴 URGENT :\n"
-            for item in urgent_items:
-                message += f"  - {item.product.name} ({item.suggested_quantity} {item.product.get_unit_display()})\n"
-            message += "\n"
-        
-        if high_items.exists():
-            message += "⚠️  PRIORITAIRE :\n"
-            for item in high_items[:5]:  # Limiter à 5
-                message += f"  - {item.product.name} ({item.suggested_quantity} {item.product.get_unit_display()})\n"
-            if high_items.count() > 5:
-                message += f"  ... et {high_items.count() - 5} autres produits prioritaires\n"
-            message += "\n"
+        by_priority = defaultdict(list)
+        for item in items:
+            by_priority[item.priority].append(item)
+        high_items = by_priority['high']
         
-        if normal_items.exists():
-            message += f"ℹ️  {normal_items.count()} autre(s) produit(s) à acheter\n\n"
-        
-        message += "Connectez-vous à SANEO pour consulter et gérer votre liste.\n\n"
-        message += "Bonnes courses !"
+        subject = f"SANEO - Nouvelle liste de courses : {shopping_list.title}"
+        message = render_to_string('shopping/emails/shopping_list.txt', {
+            'user': user,
+            'shopping_list': shopping_list,
+            'total_items': len(items),
+            'urgent': by_priority['urgent'],
+            'high': high_items,
+            'high_shown': high_items[:5],  # Limiter à 5
+            'high_hidden': max(len(high_items) - 5, 0),
+            'normal': by_priority['normal'],
+        })
         
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
+        # Mettre l'email en file d'envoi (livré par deliver_outbox)
+        OutboxMessage.objects.enqueue(user, subject, message)
         
-        return f"Email envoyé à {user.email}"
+        return f"Email mis en file d'envoi pour {user.email}"
     
     except Exception as e:
         return f"Erreur lors de l'envoi de l'email: {str(e)}"
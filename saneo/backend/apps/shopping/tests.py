@@ -1,11 +1,24 @@
 from decimal import Decimal
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
+from apps.notifications.models import OutboxMessage
 from apps.products.models import Category, Location, Product
 from apps.shopping.models import ShoppingList, ShoppingListItem
+from apps.shopping.projections import ShoppingListItemProjection
+from apps.shopping.serializers import ShoppingListItemSerializer
+from apps.shopping.services import generate_shopping_list
+from apps.shopping.tasks import (
+    generate_monthly_shopping_list, generate_monthly_shopping_list_chunk,
+    send_shopping_list_email, summarize_monthly_shopping_lists
+)
 from apps.stocks.models import StockBatch, StockMovement
 
 
@@ -74,3 +87,407 @@ class ShoppingCompleteApiTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertTrue(response.data['stock_updated'])
+
+    def test_complete_restocks_many_items_in_constant_queries(self):
+        for index in range(60):
+            product = Product.objects.create(
+                user=self.user,
+                name=f'Produit {index}',
+                category=self.category,
+                default_location=self.location,
+            )
+            ShoppingListItem.objects.create(
+                shopping_list=self.shopping_list,
+                product=product,
+                suggested_quantity=Decimal('1.00'),
+                actual_quantity=Decimal('3.00'),
+                is_checked=True,
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'/api/v1/shopping/lists/{self.shopping_list.id}/complete/',
+                {'auto_update_stock': True},
+                format='json',
+            )
+
+        self.assertEqual(response.data['batches_created'], 61)
+        self.assertLess(len(queries), 25)
+        self.assertEqual(StockBatch.objects.filter(quantity=Decimal('3.00')).count(), 60)
+        self.assertEqual(
+            StockMovement.objects.filter(type='IN', note='Achat - Liste: Liste test').count(),
+            61
+        )
+
+    def test_complete_is_rolled_back_when_restocking_fails(self):
+        with mock.patch('apps.shopping.views.create_batches', side_effect=RuntimeError('Échec')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(
+                    f'/api/v1/shopping/lists/{self.shopping_list.id}/complete/',
+                    {'auto_update_stock': True},
+                    format='json',
+                )
+
+        self.shopping_list.refresh_from_db()
+        self.assertEqual(self.shopping_list.status, 'active')
+        self.assertIsNone(self.shopping_list.completed_at)
+
+
+class ShoppingListTotalsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='totals_tester',
+            email='totals_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        category = Category.objects.create(name='nourriture')
+        for list_index in range(3):
+            shopping_list = ShoppingList.objects.create(user=self.user, title=f'Liste {list_index}')
+            for item_index in range(4):
+                product = Product.objects.create(
+                    user=self.user, name=f'Produit {list_index}-{item_index}', category=category
+                )
+                ShoppingListItem.objects.create(
+                    shopping_list=shopping_list,
+                    product=product,
+                    suggested_quantity=Decimal('1.00'),
+                    estimated_cost=Decimal('2.50'),
+                    is_checked=item_index == 0,
+                )
+        self.shopping_list = shopping_list
+
+    def test_list_endpoint_uses_annotated_totals(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/shopping/lists/')
+
+        self.assertEqual(response.data['count'], 3)
+        row = response.data['results'][0]
+        self.assertEqual(row['total_items'], 4)
+        self.assertEqual(row['checked_items'], 1)
+        self.assertEqual(row['completion_percentage'], 25)
+        self.assertEqual(row['estimated_total_cost'], '10.00')
+
+    def test_detail_endpoint_prefetches_items(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/shopping/lists/{self.shopping_list.id}/')
+
+        self.assertEqual(len(response.data['items']), 4)
+        self.assertEqual(response.data['total_items'], 4)
+        self.assertEqual(response.data['estimated_total_cost'], '10.00')
+
+    def test_by_category_query_count_does_not_depend_on_category_count(self):
+        other = Category.objects.create(name='hygiene')
+        product = Product.objects.create(user=self.user, name='Savon', category=other)
+        ShoppingListItem.objects.create(
+            shopping_list=self.shopping_list, product=product, suggested_quantity=Decimal('1.00')
+        )
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/shopping/lists/{self.shopping_list.id}/by_category/')
+
+        self.assertEqual(
+            [(group['category'], len(group['items'])) for group in response.data],
+            [('hygiene', 1), ('nourriture', 4)]
+        )
+        self.assertEqual(response.data[0]['category_display'], 'Hygiène')
+
+    def test_by_category_is_cached_until_an_item_changes(self):
+        url = f'/api/v1/shopping/lists/{self.shopping_list.id}/by_category/'
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(sum(item['is_checked'] for item in response.data[0]['items']), 1)
+
+        item = self.shopping_list.items.filter(is_checked=False).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/shopping/items/{item.id}/toggle_check/')
+
+        response = self.client.get(url)
+        self.assertEqual(sum(item['is_checked'] for item in response.data[0]['items']), 2)
+
+    def test_item_projection_matches_serializer(self):
+        other = Category.objects.create(name='hygiene')
+        product = Product.objects.create(user=self.user, name='Savon « doux »', category=other, unit='paquet')
+        ShoppingListItem.objects.create(
+            shopping_list=self.shopping_list, product=product, suggested_quantity=Decimal('2'),
+            actual_quantity=Decimal('1.5'), actual_cost=Decimal('4'), priority='urgent',
+            reason='out_of_stock', is_checked=True, notes='Marque habituelle'
+        )
+
+        queryset = ShoppingListItem.objects.select_related('product__category').order_by('id')
+        projection = ShoppingListItemProjection()
+        self.assertEqual(
+            JSONRenderer().render(projection.project(projection.values(queryset))),
+            JSONRenderer().render(ShoppingListItemSerializer(queryset, many=True).data)
+        )
+
+    def test_item_list_uses_projection(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/shopping/items/')
+
+        self.assertEqual(response.data['count'], 12)
+        row = response.data['results'][0]
+        self.assertEqual(row['category_name'], 'Nourriture')
+        self.assertEqual(row['priority_display'], 'Normale')
+
+    def test_properties_fall_back_without_annotations(self):
+        shopping_list = ShoppingList.objects.get(pk=self.shopping_list.pk)
+        annotated = ShoppingList.objects.with_totals().get(pk=self.shopping_list.pk)
+
+        for attribute in ('total_items', 'checked_items', 'completion_percentage', 'estimated_total_cost'):
+            self.assertEqual(getattr(shopping_list, attribute), getattr(annotated, attribute))
+
+
+class ShoppingListEmailTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='email_tester',
+            email='email_tester@example.com',
+            password='StrongPass123!',
+            first_name='Awa'
+        )
+        self.category = Category.objects.create(name='nourriture')
+        self.shopping_list = ShoppingList.objects.create(
+            user=self.user,
+            title='Liste mensuelle',
+            status='active',
+            is_auto_generated=True,
+        )
+
+    def _add_items(self, priority, count):
+        for _ in range(count):
+            product = Product.objects.create(
+                user=self.user,
+                name=f'{priority} {ShoppingListItem.objects.count()}',
+                category=self.category,
+                unit='kg',
+            )
+            ShoppingListItem.objects.create(
+                shopping_list=self.shopping_list,
+                product=product,
+                suggested_quantity=Decimal('1.50'),
+                priority=priority,
+                reason='below_threshold',
+            )
+
+    def test_query_count_does_not_depend_on_item_count(self):
+        self._add_items('urgent', 1)
+        self._add_items('high', 1)
+        with self.assertNumQueries(2):
+            send_shopping_list_email(self.user.id, self.shopping_list.id)
+
+        self._add_items('urgent', 5)
+        self._add_items('high', 6)
+        self._add_items('normal', 4)
+        with self.assertNumQueries(2):
+            send_shopping_list_email(self.user.id, self.shopping_list.id)
+
+        message = OutboxMessage.objects.filter(user=self.user).latest('id')
+        self.assertEqual(message.subject, 'SANEO - Nouvelle liste de courses : Liste mensuelle')
+        self.assertIn('Bonjour Awa,', message.body)
+        self.assertIn('Elle contient 17 article(s)', message.body)
+        self.assertIn('  - urgent 0 (1.50 Kilogramme)\n', message.body)
+        self.assertEqual(message.body.count('  - high '), 5)
+        self.assertIn('  ... et 2 autres produits prioritaires\n', message.body)
+        self.assertIn('ℹ️  4 autre(s) produit(s) à acheter', message.body)
+
+
+class ShoppingListGenerationTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='generation_tester',
+            email='generation_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+
+    def _create_product(self, name, threshold, stock=None, auto_add=True):
+        product = Product.objects.create(
+            user=self.user,
+            name=name,
+            category=self.category,
+            threshold=Decimal(threshold),
+            auto_add_to_list=auto_add,
+        )
+        if stock is not None:
+            StockBatch.objects.create(product=product, quantity=Decimal(stock))
+        return product
+
+    def test_generate_auto_builds_items_in_a_few_queries(self):
+        for index in range(30):
+            self._create_product(f'Rupture {index}', '2.00')
+        self._create_product('Presque vide', '10.00', stock='1.00')
+        self._create_product('Un peu bas', '10.00', stock='5.00')
+        self._create_product('Suffisant', '1.00', stock='3.00')
+        self._create_product('Hors liste', '5.00', auto_add=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            shopping_list, items = generate_shopping_list(self.user, title='Liste test')
+        self.assertLessEqual(len(queries), 5)
+
+        self.assertEqual(len(items), 32)
+        rows = {
+            item.product.name: (item.suggested_quantity, item.priority, item.reason)
+            for item in shopping_list.items.select_related('product')
+        }
+        self.assertEqual(rows['Rupture 0'], (Decimal('2.00'), 'urgent', 'out_of_stock'))
+        self.assertEqual(rows['Presque vide'], (Decimal('9.00'), 'high', 'below_threshold'))
+        self.assertEqual(rows['Un peu bas'], (Decimal('5.00'), 'normal', 'below_threshold'))
+        self.assertNotIn('Suffisant', rows)
+        self.assertNotIn('Hors liste', rows)
+
+    def test_generate_auto_without_needs_creates_no_list(self):
+        self._create_product('Suffisant', '1.00', stock='3.00')
+
+        response = self.client.post('/api/v1/shopping/lists/generate_auto/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['list_created'])
+        self.assertFalse(ShoppingList.objects.filter(user=self.user).exists())
+
+
+class ShoppingListRegenerationTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='regen_tester',
+            email='regen_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        category = Category.objects.create(name='nourriture')
+        self.products = {
+            name: Product.objects.create(
+                user=self.user, name=name, category=category, threshold=Decimal('4.00')
+            )
+            for name in ('Riz', 'Pâtes', 'Farine', 'Sel', 'Huile')
+        }
+
+    def test_regenerate_diffs_the_active_auto_list(self):
+        response = self.client.post('/api/v1/shopping/lists/generate_auto/')
+        list_id = response.data['list']['id']
+        self.assertEqual(response.data['item_count'], 5)
+
+        items = {item.product.name: item for item in ShoppingListItem.objects.filter(shopping_list_id=list_id)}
+        items['Sel'].is_checked = True
+        items['Sel'].save()
+        items['Huile'].reason = 'manual'
+        items['Huile'].save()
+
+        # Riz réapprovisionné (retiré), Pâtes partiellement (modifié), Sel et Huile protégés
+        for name, quantity in (('Riz', '5.00'), ('Pâtes', '2.00'), ('Sel', '5.00'), ('Huile', '5.00')):
+            StockBatch.objects.create(product=self.products[name], quantity=Decimal(quantity))
+        ShoppingListItem.objects.filter(product=self.products['Farine']).delete()
+
+        response = self.client.post(
+            '/api/v1/shopping/lists/generate_auto/', {'regenerate': True}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['regenerated'])
+        self.assertEqual(response.data['changes'], {'added': 1, 'updated': 1, 'removed': 1})
+        self.assertEqual(response.data['list']['id'], list_id)
+        self.assertEqual(ShoppingList.objects.filter(user=self.user).count(), 1)
+
+        rows = {
+            item.product.name: (item.suggested_quantity, item.priority)
+            for item in ShoppingListItem.objects.filter(shopping_list_id=list_id).select_related('product')
+        }
+        self.assertEqual(set(rows), {'Pâtes', 'Farine', 'Sel', 'Huile'})
+        self.assertEqual(rows['Pâtes'], (Decimal('2.00'), 'normal'))
+        self.assertEqual(rows['Farine'], (Decimal('4.00'), 'urgent'))
+
+    def test_regenerate_without_active_list_creates_one(self):
+        response = self.client.post(
+            '/api/v1/shopping/lists/generate_auto/', {'regenerate': 'true'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['list_created'])
+
+
+class MonthlyShoppingListTaskTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.category = Category.objects.create(name='nourriture')
+        self.users = []
+        for index in range(3):
+            user = user_model.objects.create_user(
+                username=f'monthly_{index}',
+                email=f'monthly_{index}@example.com',
+                password='StrongPass123!'
+            )
+            self.users.append(user)
+        # Le dernier utilisateur n'a rien à acheter
+        for user in self.users[:2]:
+            Product.objects.create(user=user, name='Riz', category=self.category, threshold=Decimal('1.00'))
+
+    @override_settings(SHOPPING_MONTHLY_CHUNK_SIZE=2, SHOPPING_MONTHLY_SPREAD_SECONDS=600)
+    def test_users_are_fanned_out_in_spread_chunks(self):
+        with mock.patch('apps.shopping.tasks.chord') as chord:
+            generate_monthly_shopping_list('2026-10')
+
+        header = chord.call_args.args[0]
+        self.assertEqual([signature.args for signature in header], [
+            ([self.users[0].pk, self.users[1].pk], '2026-10'),
+            ([self.users[2].pk], '2026-10'),
+        ])
+        self.assertEqual([signature.options['countdown'] for signature in header], [0, 300])
+        chord.return_value.assert_called_once()
+
+    def test_chunk_is_idempotent_per_user_and_month(self):
+        user_ids = [user.pk for user in self.users]
+        with mock.patch('apps.shopping.tasks.send_shopping_list_email.delay') as delay:
+            first = generate_monthly_shopping_list_chunk(user_ids, '2026-10')
+            second = generate_monthly_shopping_list_chunk(user_ids, '2026-10')
+
+        self.assertEqual(first, {'lists_created': 2, 'nothing_to_buy': 1, 'already_done': 0, 'failed': []})
+        self.assertEqual(second, {'lists_created': 0, 'nothing_to_buy': 1, 'already_done': 2, 'failed': []})
+        self.assertEqual(delay.call_count, 2)
+        self.assertEqual(ShoppingList.objects.filter(period='2026-10').count(), 2)
+        self.assertFalse(ShoppingList.objects.filter(user=self.users[2]).exists())
+        self.assertEqual(
+            ShoppingList.objects.filter(user=self.users[0]).get().title,
+            'Liste mensuelle - October 2026'
+        )
+
+        self.assertEqual(
+            summarize_monthly_shopping_lists([first, second], '2026-10'),
+            '2 listes de courses créées (2026-10), 2 sans besoin, 2 déjà générées, 0 en échec'
+        )
+
+    def test_inactive_users_and_database_errors_in_chunk_summary(self):
+        user_ids = [user.pk for user in self.users]
+        ShoppingList.objects.create(user=self.users[1], title='Octobre', period='2026-10')
+        self.users[1].is_active = False
+        self.users[1].save()
+
+        with mock.patch('apps.shopping.tasks.generate_shopping_list', side_effect=DatabaseError('Verrou')):
+            with self.assertLogs('apps.shopping.tasks', level='ERROR'):
+                summary = generate_monthly_shopping_list_chunk(user_ids, '2026-10')
+
+        # La liste de l'utilisateur désactivé n'est pas comptée comme déjà générée
+        self.assertEqual(
+            summary,
+            {'lists_created': 0, 'nothing_to_buy': 0, 'already_done': 0, 'failed': [self.users[0].pk, self.users[2].pk]}
+        )
+
+        with mock.patch('apps.shopping.tasks.generate_shopping_list', side_effect=TypeError('Bogue')):
+            with self.assertRaises(TypeError):
+                generate_monthly_shopping_list_chunk(user_ids, '2026-10')
@@ -1,18 +1,36 @@
+from itertools import groupby
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Q
-from decimal import Decimal
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from apps.core.cache import cached_per_user
+from apps.core.projections import ProjectionMixin
 from .models import ShoppingList, ShoppingListItem
+from .projections import ShoppingListItemProjection
+from .services import generate_shopping_list, regenerate_shopping_list
+from apps.stocks.services import create_batches
 from .serializers import (
     ShoppingListSerializer, ShoppingListDetailSerializer,
     ShoppingListCreateSerializer, ShoppingListItemSerializer,
     ShoppingListItemCreateSerializer, ShoppingListItemsByCategorySerializer
 )
-from apps.products.models import Product, Category
+
+def _as_bool(value):
+    """Booléen envoyé en JSON ou en formulaire ("true", "1", "on"...)"""
+    if isinstance(value, str):
+        return value.strip().lower() in ['1', 'true', 'yes', 'on']
+    return bool(value)
+
+def _prefetch_items(queryset):
+    """Précharge les articles des listes avec leur produit et sa catégorie"""
+    return queryset.prefetch_related(Prefetch(
+        'items',
+        queryset=ShoppingListItem.objects.select_related('product__category')
+    ))
 
 class ShoppingListViewSet(viewsets.ModelViewSet):
     """
@@ -26,7 +44,10 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        return ShoppingList.objects.filter(user=self.request.user)
+        queryset = ShoppingList.objects.filter(user=self.request.user).with_totals()
+        if self.action == 'retrieve':
+            queryset = _prefetch_items(queryset)
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -42,49 +63,36 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
         - Produits sous le seuil
         - Produits en rupture de stock
         - Produits qui expirent bientôt
+        
+        Avec `regenerate`, la liste automatique active la plus récente est
+        mise à jour au lieu d'en créer une nouvelle.
         """
-        user = request.user
+        if _as_bool(request.data.get('regenerate', False)):
+            active_list = self.get_queryset().filter(
+                status='active',
+                is_auto_generated=True
+            ).order_by('-created_at').first()
+            if active_list is not None:
+                changes = regenerate_shopping_list(active_list)
+                shopping_list = self._get_detail(active_list.pk)
+                return Response({
+                    'message': (
+                        f"Liste mise à jour : {changes['added']} ajouté(s), "
+                        f"{changes['updated']} modifié(s), {changes['removed']} retiré(s)"
+                    ),
+                    'list_created': False,
+                    'regenerated': True,
+                    'changes': changes,
+                    'item_count': shopping_list.total_items,
+                    'list': ShoppingListDetailSerializer(shopping_list).data
+                }, status=status.HTTP_200_OK)
         
-        # Créer la liste
-        shopping_list = ShoppingList.objects.create(
-            user=user,
-            title=f"Liste automatique - {timezone.now().strftime('%d/%m/%Y')}",
-            status='active',
-            is_auto_generated=True
+        shopping_list, items_created = generate_shopping_list(
+            request.user,
+            title=f"Liste automatique - {timezone.now().strftime('%d/%m/%Y')}"
         )
         
-        products = Product.objects.filter(user=user, auto_add_to_list=True)
-        items_created = []
-        
-        for product in products:
-            current_stock = product.total_stock
-            threshold = product.threshold
-            
-            # Produit en rupture de stock
-            if current_stock == 0:
-                item = ShoppingListItem.objects.create(
-                    shopping_list=shopping_list,
-                    product=product,
-                    suggested_quantity=threshold,
-                    priority='urgent',
-                    reason='out_of_stock'
-                )
-                items_created.append(item)
-            
-            # Produit sous le seuil
-            elif current_stock < threshold:
-                quantity_needed = threshold - current_stock
-                item = ShoppingListItem.objects.create(
-                    shopping_list=shopping_list,
-                    product=product,
-                    suggested_quantity=quantity_needed,
-                    priority='high' if current_stock < (threshold * Decimal('0.3')) else 'normal',
-                    reason='below_threshold'
-                )
-                items_created.append(item)
-        
         if not items_created:
-            shopping_list.delete()
             return Response({
                 'message': "Pas besoin de faire des courses",
                 'list_created': False,
@@ -92,7 +100,7 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
                 'list': None,
             }, status=status.HTTP_200_OK)
 
-        serializer = ShoppingListDetailSerializer(shopping_list)
+        serializer = ShoppingListDetailSerializer(self._get_detail(shopping_list.pk))
         return Response({
             'message': f'Liste générée avec {len(items_created)} articles',
             'list_created': True,
@@ -100,6 +108,10 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
             'list': serializer.data
         }, status=status.HTTP_201_CREATED)
     
+    def _get_detail(self, pk):
+        """Liste avec compteurs et articles préchargés, pour la réponse détaillée"""
+        return _prefetch_items(ShoppingList.objects.with_totals()).get(pk=pk)
+    
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
         """Activer une liste"""
@@ -112,44 +124,34 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
     def complete(self, request, pk=None):
         """Marquer une liste comme terminée"""
         shopping_list = self.get_object()
-        shopping_list.status = 'completed'
-        shopping_list.completed_at = timezone.now()
-        shopping_list.save()
         
         # Optionnel : mettre à jour les stocks pour les items cochés
-        auto_update_stock_raw = request.data.get('auto_update_stock', False)
-        if isinstance(auto_update_stock_raw, str):
-            auto_update_stock = auto_update_stock_raw.strip().lower() in ['1', 'true', 'yes', 'on']
-        else:
-            auto_update_stock = bool(auto_update_stock_raw)
+        auto_update_stock = _as_bool(request.data.get('auto_update_stock', False))
         
         batches_created = 0
         
-        if auto_update_stock:
-            from apps.stocks.models import StockBatch, StockMovement
+        # Tout ou rien : la liste n'est terminée que si le réapprovisionnement réussit
+        with transaction.atomic():
+            shopping_list.status = 'completed'
+            shopping_list.completed_at = timezone.now()
+            shopping_list.save()
             
-            for item in shopping_list.items.filter(is_checked=True):
-                quantity_to_add = item.actual_quantity or item.suggested_quantity
-
-                # Créer un nouveau lot
-                batch = StockBatch.objects.create(
-                    product=item.product,
-                    quantity=0,
-                    location=item.product.default_location,
-                    purchase_date=timezone.now().date(),
-                    purchase_price=item.actual_cost
-                )
-                
-                # Créer un mouvement d'entrée
-                StockMovement.objects.create(
-                    product=item.product,
-                    batch=batch,
-                    type='IN',
-                    quantity=quantity_to_add,
-                    user=request.user,
+            if auto_update_stock:
+                items = shopping_list.items.filter(is_checked=True).select_related('product')
+                batches = create_batches(
+                    request.user,
+                    [
+                        {
+                            'product': item.product,
+                            'quantity': item.actual_quantity or item.suggested_quantity,
+                            'location_id': item.product.default_location_id,
+                            'purchase_price': item.actual_cost,
+                        }
+                        for item in items
+                    ],
                     note=f"Achat - Liste: {shopping_list.title}"
                 )
-                batches_created += 1
+                batches_created = len(batches)
         
         return Response({
             'status': 'completed',
@@ -166,29 +168,34 @@ class ShoppingListViewSet(viewsets.ModelViewSet):
         return Response({'status': 'archived'})
     
     @action(detail=True, methods=['get'])
+    @cached_per_user('shopping:by_category', ttl=15 * 60)
     def by_category(self, request, pk=None):
         """Items groupés par catégorie"""
         shopping_list = self.get_object()
-        categories = Category.objects.all()
+        # Une seule requête triée par catégorie, regroupée en mémoire
+        items = shopping_list.items.select_related('product__category').order_by(
+            'product__category__name', 'product__category_id', '-priority', 'product__name'
+        )
         
         result = []
-        for category in categories:
-            items = shopping_list.items.filter(product__category=category)
-            if items.exists():
-                result.append({
-                    'category': category.name,
-                    'category_display': category.get_name_display(),
-                    'items': ShoppingListItemSerializer(items, many=True).data
-                })
+        for _, group in groupby(items, key=lambda item: item.product.category_id):
+            group = list(group)
+            category = group[0].product.category
+            result.append({
+                'category': category.name,
+                'category_display': category.get_name_display(),
+                'items': group
+            })
         
         serializer = ShoppingListItemsByCategorySerializer(result, many=True)
         return Response(serializer.data)
 
-class ShoppingListItemViewSet(viewsets.ModelViewSet):
+class ShoppingListItemViewSet(ProjectionMixin, viewsets.ModelViewSet):
     """
     ViewSet pour les items de liste de courses
     """
     permission_classes = [IsAuthenticated]
+    projection_class = ShoppingListItemProjection
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['shopping_list', 'product', 'priority', 'is_checked']
     ordering_fields = ['priority', 'created_at']
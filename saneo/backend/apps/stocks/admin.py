@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import StockBatch, StockMovement, ExpiryAlert
+from .models import (
+    StockBatch, StockMovement, ExpiryAlert, ExpiryTimeline, ProductStockLevel, DailyConsumption
+)
 
 @admin.register(StockBatch)
 class StockBatchAdmin(admin.ModelAdmin):
@@ -36,6 +38,27 @@ class StockMovementAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
     date_hierarchy = 'date'
 
+@admin.register(ProductStockLevel)
+class ProductStockLevelAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'batch_count', 'next_expiry_date', 'updated_at']
+    search_fields = ['product__name']
+    readonly_fields = ['product', 'quantity', 'batch_count', 'next_expiry_date', 'updated_at']
+
+@admin.register(DailyConsumption)
+class DailyConsumptionAdmin(admin.ModelAdmin):
+    list_display = ['product', 'user', 'day', 'quantity', 'count']
+    list_filter = ['day', 'user']
+    search_fields = ['product__name', 'user__username']
+    readonly_fields = ['user', 'product', 'day', 'quantity', 'count']
+    date_hierarchy = 'day'
+
+@admin.register(ExpiryTimeline)
+class ExpiryTimelineAdmin(admin.ModelAdmin):
+    list_display = ['batch', 'alert_type', 'due_date']
+    list_filter = ['alert_type', 'due_date']
+    search_fields = ['batch__product__name']
+    readonly_fields = ['batch', 'alert_type', 'due_date']
+
 @admin.register(ExpiryAlert)
 class ExpiryAlertAdmin(admin.ModelAdmin):
     list_display = ['batch', 'alert_type', 'alert_date', 'is_read', 'email_sent']
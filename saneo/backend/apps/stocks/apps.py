@@ -4,3 +4,6 @@ class StocksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.stocks'
     verbose_name = 'Stocks'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
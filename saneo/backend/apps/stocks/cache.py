@@ -0,0 +1,10 @@
+from apps.core.cache import get_user_generation
+
+# Durée de vie du résumé du tableau de bord en cache (secondes)
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+def dashboard_cache_key(user, today):
+    return (
+        f'stocks:dashboard:{user.pk}:{get_user_generation(user.pk)}'
+        f':{today.isoformat()}:{user.notification_expiry_days}'
+    )
@@ -0,0 +1,53 @@
+import csv
+import zlib
+from datetime import datetime
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+# Taille approximative des blocs envoyés au client (octets)
+EXPORT_BLOCK_SIZE = 64 * 1024
+
+class _Echo:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return value
+
+def csv_lines(header, rows):
+    """Lignes CSV (en-tête compris) générées à la demande"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_export_value(value) for value in row])
+
+def ndjson_lines(header, rows):
+    """Un objet JSON par ligne, généré à la demande"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(header, (_export_value(value) for value in row)))) + '\n'
+
+def encode_blocks(lines, compress=False):
+    """Regroupe les lignes en blocs d'octets, compressés en gzip à la volée si demandé"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= EXPORT_BLOCK_SIZE:
+            block = b''.join(buffer)
+            buffer, size = [], 0
+            block = compressor.compress(block) if compressor else block
+            if block:
+                yield block
+    block = b''.join(buffer)
+    if compressor:
+        block = compressor.compress(block) + compressor.flush()
+    if block:
+        yield block
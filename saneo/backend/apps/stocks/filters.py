@@ -0,0 +1,11 @@
+import django_filters
+from .models import StockMovement
+
+class StockMovementFilter(django_filters.FilterSet):
+    """Filtres des mouvements : produit, type, lot et période (dates incluses)"""
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='date__gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='date__lte')
+    
+    class Meta:
+        model = StockMovement
+        fields = ['product', 'type', 'batch']
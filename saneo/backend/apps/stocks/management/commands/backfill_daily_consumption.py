@@ -0,0 +1,54 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from apps.stocks.models import DailyConsumption, StockMovement
+
+class Command(BaseCommand):
+    help = (
+        'Recalcule le cumul journalier des consommations à partir des mouvements de sortie '
+        '(à relancer après modification ou suppression de mouvements)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Ne recalcule que les N derniers jours (défaut : tout l\'historique)'
+        )
+
+    def handle(self, *args, **options):
+        movements = StockMovement.objects.filter(type='OUT').annotate(day=TruncDate('date'))
+        rollup = DailyConsumption.objects.all()
+        if options['days'] is not None:
+            since = timezone.localdate() - timedelta(days=options['days'])
+            movements = movements.filter(day__gte=since)
+            rollup = rollup.filter(day__gte=since)
+
+        rows = movements.order_by().values('product_id', 'product__user_id', 'day').annotate(
+            total=Sum('quantity'),
+            movements=Count('id')
+        )
+
+        with transaction.atomic():
+            rollup.delete()
+            created = DailyConsumption.objects.bulk_create(
+                [
+                    DailyConsumption(
+                        user_id=row['product__user_id'],
+                        product_id=row['product_id'],
+                        day=row['day'],
+                        quantity=row['total'],
+                        count=row['movements']
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=1000
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {len(created)} cumul(s) journalier(s) recalculé(s)')
+        )
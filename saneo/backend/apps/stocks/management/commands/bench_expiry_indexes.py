@@ -0,0 +1,178 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from apps.products.models import Category, Product
+from apps.stocks.models import StockBatch, StockMovement, ExpiryAlert
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark des index de péremption/propriété : plans et temps des requêtes '
+        'principales avec et sans les index, sur un jeu de données synthétique. La commande '
+        'crée sa propre base de test (comme manage.py test) et la supprime en fin de course : '
+        'la base configurée n\'est ni verrouillée ni modifiée'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Nombre d\'utilisateurs synthétiques')
+        parser.add_argument('--products', type=int, default=50, help='Produits par utilisateur')
+        parser.add_argument('--batches', type=int, default=5, help='Lots par produit')
+        parser.add_argument('--movements', type=int, default=4, help='Mouvements par lot')
+        parser.add_argument('--repeat', type=int, default=20, help='Exécutions par requête')
+        parser.add_argument('--plans', action='store_true', help='Affiche les plans d\'exécution complets')
+
+    def handle(self, *args, **options):
+        random.seed(42)
+        # Base jetable : DROP INDEX verrouille les tables, jamais sur la base de l'application
+        old_name = connection.settings_dict['NAME']
+        test_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        self.stdout.write(f'Base de test : {test_name}')
+        try:
+            user = self._populate(options)
+            queries = self._queries(user)
+
+            with_indexes = self._measure(queries, options)
+            self._drop_indexes()
+            without_indexes = self._measure(queries, options)
+
+            self._report(queries, with_indexes, without_indexes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(self.style.SUCCESS('✓ Base de test supprimée'))
+
+    def _populate(self, options):
+        started = time.perf_counter()
+        stamp = int(time.time())
+        today = timezone.localdate()
+        now = timezone.now()
+        category, _ = Category.objects.get_or_create(name='autre')
+
+        users = User.objects.bulk_create([
+            User(username=f'bench_idx_{stamp}_{i}', email=f'bench_idx_{stamp}_{i}@saneo.local')
+            for i in range(options['users'])
+        ])
+        products = Product.objects.bulk_create([
+            Product(user=user, name=f'Produit {i}', category=category)
+            for user in users
+            for i in range(options['products'])
+        ], batch_size=2000)
+        batches = StockBatch.objects.bulk_create([
+            StockBatch(
+                product=product,
+                # Un tiers des lots est vide, un cinquième sans péremption
+                quantity=Decimal(random.choice([0, 0, 1, 2, 3, 5])),
+                expiry_date=None if random.random() < 0.2 else today + timedelta(days=random.randint(-60, 365)),
+                purchase_date=today
+            )
+            for product in products
+            for _ in range(options['batches'])
+        ], batch_size=2000)
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product_id=batch.product_id,
+                batch=batch,
+                type=random.choice(['IN', 'OUT', 'OUT', 'ADJUST']),
+                quantity=Decimal('1'),
+                date=now - timedelta(days=random.randint(0, 365)),
+                user_id=users[0].pk
+            )
+            for batch in batches
+            for _ in range(options['movements'])
+        ], batch_size=2000)
+        ExpiryAlert.objects.bulk_create([
+            ExpiryAlert(
+                batch=batch,
+                alert_type=random.choice(['EXPIRING_SOON', 'EXPIRED']),
+                is_read=random.random() < 0.8
+            )
+            for batch in batches
+            if batch.expiry_date and batch.expiry_date < today + timedelta(days=7)
+        ], batch_size=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.stdout.write(
+            f'Jeu de données : {len(users)} utilisateurs, {len(products)} produits, '
+            f'{len(batches)} lots, {len(batches) * options["movements"]} mouvements '
+            f'({time.perf_counter() - started:.1f}s)'
+        )
+        return users[len(users) // 2]
+
+    def _queries(self, user):
+        today = timezone.localdate()
+        return {
+            'expiring_soon': StockBatch.objects.filter(
+                product__user=user,
+                expiry_date__isnull=False,
+                expiry_date__gt=today,
+                expiry_date__lte=today + timedelta(days=7),
+                quantity__gt=0
+            ),
+            'expired': StockBatch.objects.filter(
+                product__user=user,
+                expiry_date__isnull=False,
+                expiry_date__lt=today,
+                quantity__gt=0
+            ),
+            'to_consume_first': StockBatch.objects.filter(
+                product__user=user,
+                expiry_date__isnull=False,
+                quantity__gt=0
+            ).order_by('expiry_date')[:20],
+            'expiry_scan_all_users': StockBatch.objects.filter(
+                expiry_date__isnull=False,
+                expiry_date__lte=today + timedelta(days=7),
+                quantity__gt=0
+            ).values_list('id', 'product_id'),
+            'recent_movements': StockMovement.objects.filter(
+                product__user=user,
+                date__gte=timezone.now() - timedelta(days=30)
+            ).order_by('-date'),
+            'unread_alerts': ExpiryAlert.objects.filter(
+                batch__product__user=user,
+                is_read=False
+            ).order_by('-alert_date'),
+        }
+
+    def _measure(self, queries, options):
+        timings = {}
+        for name, queryset in queries.items():
+            durations = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                durations.append(time.perf_counter() - started)
+            timings[name] = (statistics.median(durations) * 1000, queryset.explain())
+        return timings
+
+    def _drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (StockBatch, StockMovement, ExpiryAlert):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+            cursor.execute('ANALYZE')
+
+    def _report(self, queries, with_indexes, without_indexes, options):
+        self.stdout.write('')
+        self.stdout.write(f'{"Requête":<24} {"sans index":>12} {"avec index":>12} {"gain":>8}')
+        for name in queries:
+            before = without_indexes[name][0]
+            after = with_indexes[name][0]
+            self.stdout.write(f'{name:<24} {before:>10.2f}ms {after:>10.2f}ms {before / after:>7.1f}x')
+
+        for name in queries:
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, timings in (('sans index', without_indexes), ('avec index', with_indexes)):
+                plan = timings[name][1]
+                if not options['plans']:
+                    plan = plan.splitlines()[0] if plan else ''
+                self.stdout.write(f'  [{label}] {plan}')
@@ -0,0 +1,119 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from apps.products.models import Category, Location, Product
+from apps.shopping.models import ShoppingList, ShoppingListItem
+from apps.shopping.projections import ShoppingListItemProjection
+from apps.shopping.serializers import ShoppingListItemSerializer
+from apps.stocks.models import StockBatch, StockMovement
+from apps.stocks.projections import StockBatchProjection, StockMovementProjection
+from apps.stocks.serializers import StockBatchSerializer, StockMovementSerializer
+
+User = get_user_model()
+
+class _Rollback(Exception):
+    """Annule le jeu de données synthétique en fin de benchmark"""
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark des projections values() : temps CPU par ligne des serializers '
+        'de lots, mouvements et articles de courses contre leur projection (JSON identique)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Lignes par liste')
+        parser.add_argument('--repeat', type=int, default=10, help='Exécutions par mesure')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self._populate(options)
+                self._report(user, options)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write(self.style.SUCCESS('✓ Jeu de données synthétique supprimé'))
+
+    def _populate(self, options):
+        rows = options['rows']
+        stamp = int(time.time())
+        today = timezone.localdate()
+        user = User.objects.create_user(
+            username=f'bench_proj_{stamp}', email=f'bench_proj_{stamp}@saneo.local',
+            password=None, first_name='Bench', last_name='Projection'
+        )
+        category, _ = Category.objects.get_or_create(name='autre')
+        location = Location.objects.create(user=user, name='placard', description='Placard')
+        products = Product.objects.bulk_create([
+            Product(user=user, name=f'Produit {i}', category=category, unit='kg') for i in range(rows)
+        ])
+        batches = StockBatch.objects.bulk_create([
+            StockBatch(
+                product=product,
+                location=location if i % 3 else None,
+                quantity=Decimal(i % 7) + Decimal('0.25'),
+                expiry_date=today + timedelta(days=i % 90 - 30),
+                purchase_date=today,
+                purchase_price=Decimal(i % 13) + Decimal('0.99') if i % 2 else None,
+                notes=f'Lot {i}'
+            )
+            for i, product in enumerate(products)
+        ])
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product=batch.product, batch=batch, type='OUT', quantity=Decimal('1'), user=user, note='Bench'
+            )
+            for batch in batches
+        ])
+        shopping_list = ShoppingList.objects.create(user=user, title='Bench')
+        ShoppingListItem.objects.bulk_create([
+            ShoppingListItem(
+                shopping_list=shopping_list, product=product, suggested_quantity=Decimal('2'),
+                estimated_cost=Decimal('1.50'), priority='high', reason='below_threshold'
+            )
+            for product in products
+        ])
+        return user
+
+    def _cpu(self, func, options):
+        durations = []
+        for _ in range(options['repeat']):
+            started = time.process_time()
+            func()
+            durations.append(time.process_time() - started)
+        return statistics.median(durations)
+
+    def _report(self, user, options):
+        cases = [
+            ('Lots', StockBatchSerializer, StockBatchProjection,
+             StockBatch.objects.filter(product__user=user).select_related('product', 'location').order_by('id')),
+            ('Mouvements', StockMovementSerializer, StockMovementProjection,
+             StockMovement.objects.filter(user=user).select_related('product', 'batch', 'user').order_by('id')),
+            ('Articles', ShoppingListItemSerializer, ShoppingListItemProjection,
+             ShoppingListItem.objects.filter(shopping_list__user=user).select_related(
+                 'product__category').order_by('id')),
+        ]
+
+        self.stdout.write(f'{"Liste":<12} {"serializer":>14} {"projection":>14} {"gain":>8}')
+        for label, serializer_class, projection_class, queryset in cases:
+            def serialize():
+                return serializer_class(queryset.all(), many=True).data
+
+            def project():
+                projection = projection_class()
+                return projection.project(projection.values(queryset.all()))
+
+            if JSONRenderer().render(serialize()) != JSONRenderer().render(project()):
+                raise CommandError(f'{label} : JSON différent du serializer')
+
+            rows = queryset.count()
+            before = self._cpu(serialize, options) / rows * 1e6
+            after = self._cpu(project, options) / rows * 1e6
+            self.stdout.write(
+                f'{label:<12} {before:>10.1f}µs/l {after:>10.1f}µs/l {before / after:>7.1f}x'
+            )
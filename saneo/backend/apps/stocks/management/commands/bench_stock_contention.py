@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from rest_framework.test import APIClient
+from apps.products.models import Category, Product
+from apps.stocks.models import StockBatch, StockMovement, ProductStockLevel
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark de contention : consommations parallèles sur un même lot '
+        '(vérifie l\'absence de mises à jour perdues et de stock négatif). '
+        'Mode consume : action consume (FEFO sous verrou) ; mode movements : '
+        'sorties OUT créées sur /stocks/movements/ (mise à jour F() du lot). '
+        'À lancer sur PostgreSQL, SQLite sérialise les écritures.'
+    )
+
+    # Chaque mode : URL du lot visé, corps de la requête et statut d'une sortie acceptée
+    MODES = {
+        'consume': lambda batch, quantity: (
+            f'/api/v1/stocks/batches/{batch.id}/consume/',
+            {'quantity': str(quantity), 'note': 'Benchmark'},
+            200
+        ),
+        'movements': lambda batch, quantity: (
+            '/api/v1/stocks/movements/',
+            {
+                'product': batch.product_id,
+                'batch': batch.id,
+                'type': 'OUT',
+                'quantity': str(quantity),
+                'note': 'Benchmark'
+            },
+            201
+        ),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=sorted(self.MODES),
+            default='consume',
+            help='Chemin d\'écriture mis en concurrence (défaut : consume)'
+        )
+        parser.add_argument('--threads', type=int, default=8, help='Nombre de threads concurrents')
+        parser.add_argument('--iterations', type=int, default=25, help='Consommations par thread')
+        parser.add_argument('--quantity', type=Decimal, default=Decimal('1'), help='Quantité par consommation')
+        parser.add_argument(
+            '--initial',
+            type=Decimal,
+            default=None,
+            help='Quantité initiale du lot (défaut : la moitié de la demande totale)'
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        iterations = options['iterations']
+        quantity = options['quantity']
+        requested = quantity * threads * iterations
+        initial = options['initial'] if options['initial'] is not None else requested / 2
+
+        # Les refus (400) attendus ne doivent pas noyer la sortie
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        user = User.objects.create_user(
+            username=f'bench_contention_{int(time.time())}',
+            email=f'bench_contention_{int(time.time())}@saneo.local',
+            password=None
+        )
+        try:
+            category, _ = Category.objects.get_or_create(name='autre')
+            product = Product.objects.create(user=user, name='Produit benchmark', category=category)
+            batch = StockBatch.objects.create(product=product, quantity=initial)
+            url, payload, accepted = self.MODES[options['mode']](batch, quantity)
+
+            results = {'ok': 0, 'rejected': 0, 'errors': 0}
+            lock = threading.Lock()
+            start_barrier = threading.Barrier(threads)
+
+            def worker():
+                client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0], raise_request_exception=False)
+                client.force_authenticate(user)
+                start_barrier.wait()
+                try:
+                    for _ in range(iterations):
+                        response = client.post(url, payload, format='json')
+                        key = {accepted: 'ok', 400: 'rejected'}.get(response.status_code, 'errors')
+                        with lock:
+                            results[key] += 1
+                finally:
+                    connections.close_all()
+
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            started = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            batch.refresh_from_db()
+            movements = StockMovement.objects.filter(batch=batch, type='OUT').count()
+            level = ProductStockLevel.objects.get(product=product)
+            expected = initial - quantity * results['ok']
+            total_calls = threads * iterations
+
+            self.stdout.write(
+                f'Mode: {options["mode"]}, threads: {threads} x {iterations} consommations de {quantity}'
+            )
+            self.stdout.write(f'Quantité initiale: {initial}')
+            self.stdout.write(
+                f'Acceptées: {results["ok"]}, refusées: {results["rejected"]}, erreurs: {results["errors"]}'
+            )
+            self.stdout.write(f'Durée: {elapsed:.2f}s ({total_calls / elapsed:.1f} req/s)')
+            self.stdout.write(
+                f'Quantité finale: {batch.quantity} (attendue {expected}), '
+                f'ledger: {level.quantity}, mouvements OUT: {movements}'
+            )
+
+            if batch.quantity != expected or level.quantity != expected or movements != results['ok']:
+                raise CommandError('Mise à jour perdue détectée')
+            if batch.quantity < 0:
+                raise CommandError('Stock négatif détecté')
+
+            if results['errors']:
+                self.stdout.write(self.style.WARNING(
+                    f'{results["errors"]} requête(s) en erreur (verrouillage de la base ?)'
+                ))
+            self.stdout.write(self.style.SUCCESS('✓ Aucune mise à jour perdue'))
+        finally:
+            user.delete()
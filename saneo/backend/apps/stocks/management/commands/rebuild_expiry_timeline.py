@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from apps.stocks.models import StockBatch, ExpiryTimeline
+
+class Command(BaseCommand):
+    help = 'Recalcule les échéances de péremption de tous les lots non vides'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre de lots recalculés par transaction'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        batch_ids = list(
+            StockBatch.objects.filter(
+                expiry_date__isnull=False,
+                quantity__gt=0
+            ).order_by('pk').values_list('pk', flat=True)
+        )
+
+        # Les entrées orphelines (lots vidés hors des chemins habituels) sont purgées
+        ExpiryTimeline.objects.filter(
+            Q(batch__quantity__lte=0) | Q(batch__expiry_date__isnull=True)
+        ).delete()
+        for start in range(0, len(batch_ids), chunk_size):
+            ExpiryTimeline.objects.schedule(batch_ids[start:start + chunk_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Échéances recalculées pour {len(batch_ids)} lot(s)')
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from apps.products.models import Product
+from apps.stocks.models import ProductStockLevel
+
+class Command(BaseCommand):
+    help = 'Recalcule les niveaux de stock de tous les produits à partir des lots'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre de produits recalculés par transaction'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+
+        for start in range(0, len(product_ids), chunk_size):
+            ProductStockLevel.objects.refresh(product_ids[start:start + chunk_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Niveaux de stock recalculés pour {len(product_ids)} produit(s)')
+        )
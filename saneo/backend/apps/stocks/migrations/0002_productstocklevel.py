@@ -0,0 +1,58 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_stock_levels(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    StockBatch = apps.get_model('stocks', 'StockBatch')
+    ProductStockLevel = apps.get_model('stocks', 'ProductStockLevel')
+
+    totals = {
+        row['product_id']: row
+        for row in StockBatch.objects.order_by().values('product_id').annotate(
+            total=models.Sum('quantity'),
+            positive_batches=models.Count('id', filter=models.Q(quantity__gt=0)),
+            next_expiry=models.Min('expiry_date', filter=models.Q(quantity__gt=0)),
+        )
+    }
+    ProductStockLevel.objects.bulk_create(
+        [
+            ProductStockLevel(
+                product_id=product_id,
+                quantity=totals.get(product_id, {}).get('total') or 0,
+                batch_count=totals.get(product_id, {}).get('positive_batches') or 0,
+                next_expiry_date=totals.get(product_id, {}).get('next_expiry'),
+            )
+            for product_id in Product.objects.values_list('pk', flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('stocks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Quantité en stock')),
+                ('batch_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de lots')),
+                ('next_expiry_date', models.DateField(blank=True, null=True, verbose_name='Prochaine péremption')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_level', to='products.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Niveau de stock',
+                'verbose_name_plural': 'Niveaux de stock',
+            },
+        ),
+        migrations.RunPython(backfill_stock_levels, migrations.RunPython.noop),
+    ]
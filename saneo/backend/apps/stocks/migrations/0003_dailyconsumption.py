@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_consumption(apps, schema_editor):
+    StockMovement = apps.get_model('stocks', 'StockMovement')
+    DailyConsumption = apps.get_model('stocks', 'DailyConsumption')
+
+    rows = StockMovement.objects.filter(type='OUT').annotate(
+        day=TruncDate('date')
+    ).order_by().values('product_id', 'product__user_id', 'day').annotate(
+        total=models.Sum('quantity'),
+        movements=models.Count('id'),
+    )
+    DailyConsumption.objects.bulk_create(
+        [
+            DailyConsumption(
+                user_id=row['product__user_id'],
+                product_id=row['product_id'],
+                day=row['day'],
+                quantity=row['total'],
+                count=row['movements'],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0001_initial'),
+        ('stocks', '0002_productstocklevel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Quantité consommée')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre de sorties')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_consumptions', to='products.product', verbose_name='Produit')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_consumptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Consommation journalière',
+                'verbose_name_plural': 'Consommations journalières',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['user', 'day'], name='stocks_dailycons_user_day')],
+                'unique_together': {('product', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_consumption, migrations.RunPython.noop),
+    ]
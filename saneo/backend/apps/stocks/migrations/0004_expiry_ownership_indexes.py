@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0003_dailyconsumption'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expiryalert',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['-alert_date'], name='stocks_alert_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='stockbatch',
+            index=models.Index(condition=models.Q(('quantity__gt', 0)), fields=['product', 'expiry_date'], name='stocks_batch_prod_exp_pos'),
+        ),
+        migrations.AddIndex(
+            model_name='stockbatch',
+            index=models.Index(condition=models.Q(('expiry_date__isnull', False), ('quantity__gt', 0)), fields=['expiry_date'], name='stocks_batch_exp_pos'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', '-date'], name='stocks_move_prod_date'),
+        ),
+    ]
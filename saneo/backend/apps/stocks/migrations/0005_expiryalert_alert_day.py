@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:36
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+import django.utils.timezone
+
+
+def backfill_alert_day(apps, schema_editor):
+    ExpiryAlert = apps.get_model('stocks', 'ExpiryAlert')
+
+    ExpiryAlert.objects.update(alert_day=TruncDate('alert_date'))
+
+    # Conserve la plus ancienne alerte de chaque (lot, type, jour)
+    duplicates = ExpiryAlert.objects.order_by().values(
+        'batch_id', 'alert_type', 'alert_day'
+    ).annotate(
+        keep=models.Min('id'),
+        total=models.Count('id'),
+    ).filter(total__gt=1)
+    for row in duplicates.iterator():
+        ExpiryAlert.objects.filter(
+            batch_id=row['batch_id'],
+            alert_type=row['alert_type'],
+            alert_day=row['alert_day'],
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0004_expiry_ownership_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expiryalert',
+            name='alert_day',
+            field=models.DateField(null=True, editable=False, verbose_name="Jour de l'alerte"),
+        ),
+        migrations.RunPython(backfill_alert_day, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='expiryalert',
+            name='alert_day',
+            field=models.DateField(default=django.utils.timezone.localdate, editable=False, verbose_name="Jour de l'alerte"),
+        ),
+        migrations.AddConstraint(
+            model_name='expiryalert',
+            constraint=models.UniqueConstraint(fields=('batch', 'alert_type', 'alert_day'), name='stocks_alert_unique_per_day'),
+        ),
+    ]
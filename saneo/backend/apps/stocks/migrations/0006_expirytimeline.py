@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+from django.utils import timezone
+
+
+def backfill_expiry_timeline(apps, schema_editor):
+    StockBatch = apps.get_model('stocks', 'StockBatch')
+    ExpiryAlert = apps.get_model('stocks', 'ExpiryAlert')
+    ExpiryTimeline = apps.get_model('stocks', 'ExpiryTimeline')
+
+    today = timezone.localdate()
+    alerted = {
+        (row['batch_id'], row['alert_type']): row['last_day']
+        for row in ExpiryAlert.objects.order_by().values('batch_id', 'alert_type').annotate(
+            last_day=models.Max('alert_day')
+        ).iterator()
+    }
+
+    entries = []
+    batches = StockBatch.objects.filter(
+        expiry_date__isnull=False,
+        quantity__gt=0,
+    ).order_by().values_list('id', 'expiry_date', 'product__user__notification_expiry_days')
+    for batch_id, expiry_date, days in batches.iterator():
+        crossings = [('EXPIRED', expiry_date + timedelta(days=1))]
+        if expiry_date > today:
+            crossings.append(('EXPIRING_SOON', expiry_date - timedelta(days=days)))
+        for alert_type, due_date in crossings:
+            last_day = alerted.get((batch_id, alert_type))
+            if last_day is not None and last_day >= due_date:
+                continue
+            entries.append(ExpiryTimeline(batch_id=batch_id, alert_type=alert_type, due_date=due_date))
+    ExpiryTimeline.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0005_expiryalert_alert_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpiryTimeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('EXPIRING_SOON', 'Expire bientôt'), ('EXPIRED', 'Expiré')], max_length=20, verbose_name="Type d'alerte")),
+                ('due_date', models.DateField(db_index=True, verbose_name='Échéance')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to='stocks.stockbatch', verbose_name='Lot')),
+            ],
+            options={
+                'verbose_name': 'Échéance de péremption',
+                'verbose_name_plural': 'Échéances de péremption',
+                'ordering': ['due_date'],
+                'unique_together': {('batch', 'alert_type')},
+            },
+        ),
+        migrations.RunPython(backfill_expiry_timeline, migrations.RunPython.noop),
+    ]
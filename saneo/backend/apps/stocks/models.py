@@ -1,8 +1,16 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 from django.utils import timezone
+from collections import defaultdict
 from datetime import timedelta
 
+class InsufficientStockError(Exception):
+    """Quantité disponible insuffisante pour une sortie de stock"""
+    
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f"Quantité insuffisante. Disponible: {available}")
+
 class StockBatch(models.Model):
     """Lots de stock pour un produit"""
     product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='batches', verbose_name="Produit")
@@ -33,10 +41,40 @@ class StockBatch(models.Model):
         verbose_name = "Lot de stock"
         verbose_name_plural = "Lots de stock"
         ordering = ['expiry_date', '-created_at']
+        indexes = [
+            # Lots non vides d'un produit par date de péremption (FEFO, alertes, tableau de bord)
+            models.Index(
+                fields=['product', 'expiry_date'],
+                condition=models.Q(quantity__gt=0),
+                name='stocks_batch_prod_exp_pos'
+            ),
+            # Parcours des péremptions tous utilisateurs confondus (tâche quotidienne)
+            models.Index(
+                fields=['expiry_date'],
+                condition=models.Q(quantity__gt=0, expiry_date__isnull=False),
+                name='stocks_batch_exp_pos'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.quantity} {self.product.get_unit_display()}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Produit d'origine : un lot déplacé vers un autre produit met à jour les deux niveaux
+        instance._loaded_product_id = instance.__dict__.get('product_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Mise à jour du niveau de stock et des échéances à chaque enregistrement du lot"""
+        product_ids = {self.product_id, getattr(self, '_loaded_product_id', None)} - {None}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            ProductStockLevel.objects.refresh(sorted(product_ids))
+            ExpiryTimeline.objects.schedule([self.pk])
+        self._loaded_product_id = self.product_id
+    
     @property
     def is_expired(self):
         """Vérifie si le lot est périmé"""
@@ -89,26 +127,228 @@ class StockMovement(models.Model):
         verbose_name = "Mouvement de stock"
         verbose_name_plural = "Mouvements de stock"
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['product', '-date'], name='stocks_move_prod_date'),
+        ]
     
     def __str__(self):
         return f"{self.get_type_display()} - {self.product.name} - {self.quantity}"
     
+    # Champs qui déterminent la contribution au cumul journalier
+    ROLLUP_FIELDS = ('product_id', 'type', 'quantity', 'date')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rollup = instance.rollup_state()
+        return instance
+    
+    def rollup_state(self):
+        """Champs du cumul journalier chargés (un champ différé vaut None)"""
+        return {field: self.__dict__.get(field) for field in self.ROLLUP_FIELDS}
+    
     def save(self, *args, **kwargs):
-        """Mise à jour automatique du stock lors d'un mouvement"""
+        """Mise à jour automatique du stock et du cumul journalier lors d'un mouvement"""
         is_new = self.pk is None
-        super().save(*args, **kwargs)
+        previous = getattr(self, '_loaded_rollup', None)
+        with transaction.atomic():
+            if is_new and self.batch_id:
+                self.apply_to_batch()
+            super().save(*args, **kwargs)
+            
+            if is_new:
+                DailyConsumption.objects.record([self])
+            elif previous is not None and None not in previous.values() and previous != self.rollup_state():
+                # Modification (API, admin...) : l'ancienne sortie est remplacée par la nouvelle
+                DailyConsumption.objects.remove([StockMovement(**previous)])
+                DailyConsumption.objects.record([self])
+        self._loaded_rollup = self.rollup_state()
+    
+    def apply_to_batch(self):
+        """
+        Applique le mouvement au lot par une mise à jour atomique (F())
+        qui ne touche que quantity/updated_at, sans lecture préalable.
+        """
+        batches = StockBatch.objects.filter(pk=self.batch_id)
+        now = timezone.now()
         
-        if is_new and self.batch:
-            # Mise à jour de la quantité du lot
-            if self.type == 'IN':
-                self.batch.quantity += self.quantity
-            elif self.type == 'OUT':
-                self.batch.quantity -= self.quantity
-            elif self.type == 'ADJUST':
-                # L'ajustement remplace la quantité
-                self.batch.quantity = self.quantity
+        if self.type == 'IN':
+            batches.update(quantity=models.F('quantity') + self.quantity, updated_at=now)
+        elif self.type == 'OUT':
+            # La condition est réévaluée sous verrou : pas de stock négatif
+            updated = batches.filter(quantity__gte=self.quantity).update(
+                quantity=models.F('quantity') - self.quantity,
+                updated_at=now
+            )
+            if not updated:
+                available = batches.values_list('quantity', flat=True).first()
+                raise InsufficientStockError(available if available is not None else 0)
+        elif self.type == 'ADJUST':
+            # L'ajustement remplace la quantité
+            batches.update(quantity=self.quantity, updated_at=now)
+        
+        self.batch.refresh_from_db(fields=['quantity', 'updated_at'])
+        ProductStockLevel.objects.refresh([self.batch.product_id])
+        
+        # Les échéances ne changent que si le lot est vidé ou cesse de l'être
+        if self.batch.quantity <= 0:
+            ExpiryTimeline.objects.unschedule([self.batch_id])
+        elif self.type == 'ADJUST' or (self.type == 'IN' and self.batch.quantity <= self.quantity):
+            ExpiryTimeline.objects.schedule([self.batch_id])
+
+class ProductStockLevelManager(models.Manager):
+    def refresh(self, product_ids):
+        """
+        Recalcule le niveau de stock des produits donnés à partir de leurs lots.
+        Les produits sont verrouillés pour sérialiser les mises à jour concurrentes.
+        """
+        from apps.products.models import Product
+        
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        
+        with transaction.atomic():
+            existing_ids = list(
+                Product.objects.select_for_update().filter(
+                    pk__in=product_ids
+                ).order_by('pk').values_list('pk', flat=True)
+            )
+            if not existing_ids:
+                return
+            
+            totals = {
+                row['product_id']: row
+                for row in StockBatch.objects.filter(
+                    product_id__in=existing_ids
+                ).order_by().values('product_id').annotate(
+                    total=models.Sum('quantity'),
+                    positive_batches=models.Count('id', filter=models.Q(quantity__gt=0)),
+                    next_expiry=models.Min('expiry_date', filter=models.Q(quantity__gt=0))
+                )
+            }
             
-            self.batch.save()
+            levels = []
+            for product_id in existing_ids:
+                row = totals.get(product_id, {})
+                levels.append(self.model(
+                    product_id=product_id,
+                    quantity=row.get('total') or 0,
+                    batch_count=row.get('positive_batches') or 0,
+                    next_expiry_date=row.get('next_expiry')
+                ))
+            
+            self.bulk_create(
+                levels,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=['quantity', 'batch_count', 'next_expiry_date', 'updated_at']
+            )
+
+class ProductStockLevel(models.Model):
+    """Niveau de stock courant d'un produit, maintenu à chaque mouvement"""
+    product = models.OneToOneField(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='stock_level',
+        verbose_name="Produit"
+    )
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Quantité en stock")
+    batch_count = models.PositiveIntegerField(default=0, verbose_name="Nombre de lots")
+    next_expiry_date = models.DateField(null=True, blank=True, verbose_name="Prochaine péremption")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = ProductStockLevelManager()
+    
+    class Meta:
+        verbose_name = "Niveau de stock"
+        verbose_name_plural = "Niveaux de stock"
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.quantity}"
+
+class DailyConsumptionManager(models.Manager):
+    def _totals(self, movements):
+        """Quantité et nombre de sorties par (produit, jour)"""
+        totals = defaultdict(lambda: [0, 0])
+        for movement in movements:
+            if movement.type != 'OUT':
+                continue
+            key = (movement.product_id, timezone.localdate(movement.date))
+            totals[key][0] += movement.quantity
+            totals[key][1] += 1
+        return totals
+    
+    def record(self, movements):
+        """Ajoute des sorties de stock au cumul journalier de leurs produits"""
+        from apps.products.models import Product
+        
+        totals = self._totals(movements)
+        if not totals:
+            return
+        
+        owners = {}
+        for movement in movements:
+            if StockMovement.product.is_cached(movement):
+                owners[movement.product_id] = movement.product.user_id
+        missing = {product_id for product_id, _ in totals} - owners.keys()
+        if missing:
+            owners.update(Product.objects.filter(pk__in=missing).values_list('pk', 'user_id'))
+        
+        for (product_id, day), (quantity, count) in totals.items():
+            rows = self.filter(product_id=product_id, day=day)
+            if rows.update(quantity=models.F('quantity') + quantity, count=models.F('count') + count):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(
+                        user_id=owners[product_id],
+                        product_id=product_id,
+                        day=day,
+                        quantity=quantity,
+                        count=count
+                    )
+            except IntegrityError:
+                # Ligne créée entre-temps par une transaction concurrente
+                rows.update(quantity=models.F('quantity') + quantity, count=models.F('count') + count)
+    
+    def remove(self, movements):
+        """Retire des sorties de stock du cumul journalier (mouvement modifié ou supprimé)"""
+        for (product_id, day), (quantity, count) in self._totals(movements).items():
+            rows = self.filter(product_id=product_id, day=day)
+            rows.filter(count__gte=count).update(
+                quantity=models.F('quantity') - quantity,
+                count=models.F('count') - count
+            )
+            rows.filter(count=0).delete()
+
+class DailyConsumption(models.Model):
+    """Consommation journalière cumulée par produit (mouvements de sortie)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_consumptions')
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.CASCADE,
+        related_name='daily_consumptions',
+        verbose_name="Produit"
+    )
+    day = models.DateField(verbose_name="Jour")
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Quantité consommée")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre de sorties")
+    
+    objects = DailyConsumptionManager()
+    
+    class Meta:
+        verbose_name = "Consommation journalière"
+        verbose_name_plural = "Consommations journalières"
+        ordering = ['-day']
+        unique_together = ['product', 'day']
+        indexes = [
+            models.Index(fields=['user', 'day'], name='stocks_dailycons_user_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} - {self.day} - {self.quantity}"
 
 class ExpiryAlert(models.Model):
     """Alertes de péremption"""
@@ -120,6 +360,8 @@ class ExpiryAlert(models.Model):
     batch = models.ForeignKey(StockBatch, on_delete=models.CASCADE, related_name='alerts', verbose_name="Lot")
     alert_type = models.CharField(max_length=20, choices=ALERT_TYPES, verbose_name="Type d'alerte")
     alert_date = models.DateTimeField(auto_now_add=True, verbose_name="Date de l'alerte")
+    # Jour local de l'alerte : une seule alerte par lot, type et jour
+    alert_day = models.DateField(default=timezone.localdate, editable=False, verbose_name="Jour de l'alerte")
     is_read = models.BooleanField(default=False, verbose_name="Lu")
     email_sent = models.BooleanField(default=False, verbose_name="Email envoyé")
     
@@ -127,6 +369,82 @@ class ExpiryAlert(models.Model):
         verbose_name = "Alerte de péremption"
         verbose_name_plural = "Alertes de péremption"
         ordering = ['-alert_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['batch', 'alert_type', 'alert_day'],
+                name='stocks_alert_unique_per_day'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['-alert_date'],
+                condition=models.Q(is_read=False),
+                name='stocks_alert_unread'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.get_alert_type_display()} - {self.batch.product.name}"
+
+class ExpiryTimelineManager(models.Manager):
+    def schedule(self, batch_ids):
+        """
+        Recalcule les échéances des lots donnés (identifiants ou sous-requête) :
+        entrée dans la fenêtre de notification de l'utilisateur et péremption.
+        Les franchissements déjà signalés par une alerte ne sont pas reprogrammés.
+        """
+        today = timezone.localdate()
+        with transaction.atomic():
+            self.filter(batch_id__in=batch_ids).delete()
+            
+            batches = StockBatch.objects.filter(
+                pk__in=batch_ids,
+                expiry_date__isnull=False,
+                quantity__gt=0
+            ).order_by().values_list('id', 'expiry_date', 'product__user__notification_expiry_days')
+            batches = list(batches)
+            if not batches:
+                return
+            
+            alerted = {
+                (row['batch_id'], row['alert_type']): row['last_day']
+                for row in ExpiryAlert.objects.filter(
+                    batch_id__in=[batch_id for batch_id, _, _ in batches]
+                ).order_by().values('batch_id', 'alert_type').annotate(last_day=models.Max('alert_day'))
+            }
+            
+            entries = []
+            for batch_id, expiry_date, days in batches:
+                crossings = [('EXPIRED', expiry_date + timedelta(days=1))]
+                if expiry_date > today:
+                    crossings.append(('EXPIRING_SOON', expiry_date - timedelta(days=days)))
+                for alert_type, due_date in crossings:
+                    last_day = alerted.get((batch_id, alert_type))
+                    if last_day is not None and last_day >= due_date:
+                        continue
+                    entries.append(self.model(batch_id=batch_id, alert_type=alert_type, due_date=due_date))
+            self.bulk_create(entries, batch_size=1000)
+    
+    def unschedule(self, batch_ids):
+        """Supprime les échéances des lots vidés"""
+        self.filter(batch_id__in=batch_ids).delete()
+
+class ExpiryTimeline(models.Model):
+    """
+    Échéances de péremption à venir : la tâche quotidienne ne lit que les
+    entrées arrivées à échéance au lieu de parcourir tous les lots
+    """
+    batch = models.ForeignKey(StockBatch, on_delete=models.CASCADE, related_name='timeline', verbose_name="Lot")
+    alert_type = models.CharField(max_length=20, choices=ExpiryAlert.ALERT_TYPES, verbose_name="Type d'alerte")
+    due_date = models.DateField(db_index=True, verbose_name="Échéance")
+    
+    objects = ExpiryTimelineManager()
+    
+    class Meta:
+        verbose_name = "Échéance de péremption"
+        verbose_name_plural = "Échéances de péremption"
+        ordering = ['due_date']
+        unique_together = ['batch', 'alert_type']
+    
+    def __str__(self):
+        return f"{self.get_alert_type_display()} - lot #{self.batch_id} - {self.due_date}"
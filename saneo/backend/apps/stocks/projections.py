@@ -0,0 +1,86 @@
+from django.utils import timezone
+from apps.core.projections import ValuesProjection, choice_labels
+from apps.products.models import Location, Product
+from .models import StockMovement
+from .serializers import StockBatchSerializer, StockMovementSerializer
+
+class StockBatchProjection(ValuesProjection):
+    """Projection de StockBatchSerializer"""
+    serializer_class = StockBatchSerializer
+    fields = (
+        'id', 'product_id', 'product__name', 'product__unit', 'quantity', 'location_id',
+        'location__name', 'expiry_date', 'purchase_date', 'purchase_price', 'supplier', 'notes',
+        'created_at', 'updated_at'
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.units = choice_labels(Product, 'unit')
+        self.locations = choice_labels(Location, 'name')
+        self.today = timezone.now().date()
+        fields = self.serializer_fields
+        self.quantity = fields['quantity'].to_representation
+        self.expiry_date = self.nullable('expiry_date')
+        self.purchase_date = fields['purchase_date'].to_representation
+        self.purchase_price = self.nullable('purchase_price')
+        self.created_at = fields['created_at'].to_representation
+        self.updated_at = fields['updated_at'].to_representation
+
+    def to_representation(self, row):
+        unit = row['product__unit']
+        expiry_date = row['expiry_date']
+        data = {
+            'id': row['id'],
+            'product': row['product_id'],
+            'product_name': row['product__name'],
+            'product_unit': self.units.get(unit, unit),
+            'quantity': self.quantity(row['quantity']),
+            'location': row['location_id'],
+        }
+        # Sans emplacement, le serializer omet location_name
+        if row['location_id'] is not None:
+            name = row['location__name']
+            data['location_name'] = self.locations.get(name, name)
+        data['expiry_date'] = self.expiry_date(expiry_date)
+        data['purchase_date'] = self.purchase_date(row['purchase_date'])
+        data['purchase_price'] = self.purchase_price(row['purchase_price'])
+        data['supplier'] = row['supplier']
+        data['notes'] = row['notes']
+        data['is_expired'] = expiry_date is not None and expiry_date < self.today
+        data['days_until_expiry'] = (expiry_date - self.today).days if expiry_date is not None else None
+        data['created_at'] = self.created_at(row['created_at'])
+        data['updated_at'] = self.updated_at(row['updated_at'])
+        return data
+
+class StockMovementProjection(ValuesProjection):
+    """Projection de StockMovementSerializer"""
+    serializer_class = StockMovementSerializer
+    fields = (
+        'id', 'product_id', 'product__name', 'batch_id', 'type', 'quantity', 'date', 'note',
+        'user__first_name', 'user__last_name', 'created_at'
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.types = choice_labels(StockMovement, 'type')
+        fields = self.serializer_fields
+        self.quantity = fields['quantity'].to_representation
+        self.date = fields['date'].to_representation
+        self.created_at = fields['created_at'].to_representation
+
+    def to_representation(self, row):
+        movement_type = row['type']
+        return {
+            'id': row['id'],
+            'product': row['product_id'],
+            'product_name': row['product__name'],
+            'batch': row['batch_id'],
+            'type': movement_type,
+            'type_display': self.types.get(movement_type, movement_type),
+            'quantity': self.quantity(row['quantity']),
+            'date': self.date(row['date']),
+            'note': row['note'],
+            # Comme User.get_full_name()
+            'user_name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+            'created_at': self.created_at(row['created_at']),
+        }
@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from .models import StockBatch, StockMovement, ExpiryAlert
+from .models import StockBatch, StockMovement, ExpiryAlert, InsufficientStockError
 from apps.products.serializers import ProductListSerializer
+from .services import create_batches
 
 class StockBatchSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -30,21 +31,42 @@ class StockBatchCreateSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        initial_quantity = validated_data['quantity']
-        validated_data['quantity'] = 0
-        batch = super().create(validated_data)
-        
-        # Créer automatiquement un mouvement d'entrée
-        StockMovement.objects.create(
-            product=batch.product,
-            batch=batch,
-            type='IN',
-            quantity=initial_quantity,
-            user=self.context['request'].user,
-            note=f"Création du lot #{batch.id}"
-        )
-        
-        return batch
+        # Le lot est créé avec sa quantité finale, avec son mouvement d'entrée
+        return create_batches(self.context['request'].user, [validated_data])[0]
+
+class StockBatchBulkItemSerializer(serializers.ModelSerializer):
+    """
+    Lot d'une saisie groupée. Les produits et emplacements de l'utilisateur
+    sont chargés une seule fois et transmis via le contexte.
+    """
+    product = serializers.IntegerField()
+    location = serializers.IntegerField(required=False, allow_null=True)
+    
+    class Meta:
+        model = StockBatch
+        fields = [
+            'product', 'quantity', 'location', 'expiry_date',
+            'purchase_date', 'purchase_price', 'supplier', 'notes'
+        ]
+    
+    def validate_product(self, value):
+        product = self.context['products'].get(value)
+        if product is None:
+            raise serializers.ValidationError("Produit introuvable.")
+        return product
+    
+    def validate_location(self, value):
+        if value is None:
+            return None
+        location = self.context['locations'].get(value)
+        if location is None:
+            raise serializers.ValidationError("Emplacement introuvable.")
+        return location
+    
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("La quantité doit être positive.")
+        return value
 
 class StockMovementSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -86,7 +108,10 @@ class StockMovementCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        try:
+            return super().create(validated_data)
+        except InsufficientStockError as e:
+            raise serializers.ValidationError(str(e))
 
 class ExpiryAlertSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='batch.product.name', read_only=True)
@@ -118,3 +143,11 @@ class StockSummarySerializer(serializers.Serializer):
     batches_expiring_soon = serializers.IntegerField()
     batches_expired = serializers.IntegerField()
     total_value = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+class StockMovementTimeseriesSerializer(serializers.Serializer):
+    """Serializer pour les totaux de mouvements par période"""
+    period = serializers.DateField()
+    total_in = serializers.DecimalField(max_digits=15, decimal_places=2)
+    total_out = serializers.DecimalField(max_digits=15, decimal_places=2)
+    total_adjust = serializers.DecimalField(max_digits=15, decimal_places=2)
+    movements = serializers.IntegerField()
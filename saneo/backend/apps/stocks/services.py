@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from apps.core.cache import bump_user_generation
+from .models import (
+    StockBatch, StockMovement, ProductStockLevel, DailyConsumption, ExpiryTimeline, InsufficientStockError
+)
+
+def allocate_fefo(batches, quantity):
+    """
+    Répartit une quantité sur des lots déjà triés (premier expiré, premier sorti).
+    Retourne la liste des couples (lot, quantité prélevée).
+    """
+    allocations = []
+    remaining = quantity
+    for batch in batches:
+        if remaining <= 0:
+            break
+        consumed = min(batch.quantity, remaining)
+        if consumed > 0:
+            allocations.append((batch, consumed))
+            remaining -= consumed
+    return allocations
+
+def consume_fefo(product, quantity, user, note='', batch_ids=None):
+    """
+    Consomme une quantité d'un produit en priorisant les lots qui expirent
+    le plus tôt, puis les lots sans péremption.
+
+    Les lots candidats sont verrouillés une seule fois, la répartition est
+    calculée en mémoire puis appliquée en masse dans une seule transaction.
+    Retourne (mouvements créés, quantité restante dans les lots candidats).
+    Lève InsufficientStockError si le stock disponible ne suffit pas.
+    """
+    with transaction.atomic():
+        batches = StockBatch.objects.select_for_update().filter(
+            product=product,
+            quantity__gt=0
+        )
+        if batch_ids is not None:
+            batches = batches.filter(pk__in=batch_ids)
+        batches = list(batches.order_by(
+            F('expiry_date').asc(nulls_last=True), 'purchase_date', 'id'
+        ))
+
+        available = sum((batch.quantity for batch in batches), 0)
+        if quantity > available:
+            raise InsufficientStockError(available)
+
+        now = timezone.now()
+        allocations = allocate_fefo(batches, quantity)
+        movements = []
+        for batch, consumed in allocations:
+            batch.quantity -= consumed
+            batch.updated_at = now
+            movements.append(StockMovement(
+                product=product,
+                batch=batch,
+                type='OUT',
+                quantity=consumed,
+                date=now,
+                note=note,
+                user=user
+            ))
+
+        StockBatch.objects.bulk_update([batch for batch, _ in allocations], ['quantity', 'updated_at'])
+        # bulk_create ne passe pas par StockMovement.save : les lots sont déjà à jour
+        StockMovement.objects.bulk_create(movements)
+        DailyConsumption.objects.record(movements)
+        ProductStockLevel.objects.refresh([product.pk])
+        ExpiryTimeline.objects.unschedule([batch.pk for batch, _ in allocations if batch.quantity <= 0])
+        bump_user_generation(product.user_id)
+
+    return movements, available - quantity
+
+def create_batches(user, lots, note=None):
+    """
+    Crée des lots avec leur quantité finale et leurs mouvements d'entrée
+    en masse, dans une seule transaction.
+
+    `lots` contient les données validées d'un lot (produit sous forme
+    d'instance). `note` remplace la note par défaut des mouvements.
+    Retourne les lots créés, dans le même ordre.
+    """
+    today = timezone.localdate()
+    with transaction.atomic():
+        batches = StockBatch.objects.bulk_create([
+            StockBatch(**{'purchase_date': today, **lot}) for lot in lots
+        ])
+        StockMovement.objects.bulk_create([
+            StockMovement(
+                product=batch.product,
+                batch=batch,
+                type='IN',
+                quantity=batch.quantity,
+                user=user,
+                note=note if note is not None else f"Création du lot #{batch.id}"
+            )
+            for batch in batches
+        ])
+        ProductStockLevel.objects.refresh({batch.product_id for batch in batches})
+        ExpiryTimeline.objects.schedule([batch.pk for batch in batches])
+        for user_id in {batch.product.user_id for batch in batches}:
+            bump_user_generation(user_id)
+    return batches
@@ -0,0 +1,47 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.products.models import Product
+from apps.core.cache import bump_user_generation
+from .models import DailyConsumption, StockBatch, StockMovement, ProductStockLevel
+
+@receiver(post_delete, sender=StockBatch)
+def refresh_stock_level_on_batch_delete(sender, instance, origin=None, **kwargs):
+    """Mise à jour du niveau de stock lors de la suppression d'un lot"""
+    # Suppression en cascade (produit, utilisateur) : le niveau de stock disparaît aussi
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not StockBatch:
+        return
+    ProductStockLevel.objects.refresh([instance.product_id])
+
+@receiver(post_delete, sender=StockMovement)
+def remove_deleted_movement_from_rollup(sender, instance, origin=None, **kwargs):
+    """Retire une sortie supprimée (API, admin, queryset) du cumul journalier"""
+    # Suppression en cascade (produit, utilisateur) : le cumul disparaît aussi
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and origin_model is not StockMovement:
+        return
+    DailyConsumption.objects.remove([instance])
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_stock_cache_on_product_change(sender, instance, origin=None, **kwargs):
+    # Suppression en cascade (utilisateur) : l'utilisateur invalide déjà le cache
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and origin_model is not Product:
+        return
+    bump_user_generation(instance.user_id)
+
+@receiver([post_save, post_delete], sender=StockBatch)
+@receiver([post_save, post_delete], sender=StockMovement)
+def invalidate_stock_cache_on_stock_change(sender, instance, origin=None, **kwargs):
+    # Suppression en cascade (produit, utilisateur) : le produit ou l'utilisateur
+    # invalide le cache une seule fois, sans requête par ligne supprimée
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin is not None and origin_model is not sender:
+        return
+    if sender.product.is_cached(instance):
+        user_id = instance.product.user_id
+    else:
+        user_id = Product.objects.filter(pk=instance.product_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        bump_user_generation(user_id)
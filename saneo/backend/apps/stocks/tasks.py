@@ -1,69 +1,103 @@
+from collections import defaultdict
 from celery import shared_task
+from django.db import transaction
+from django.template.loader import render_to_string
 from django.utils import timezone
-from django.core.mail import send_mail
-from django.conf import settings
 from datetime import timedelta
-from .models import StockBatch, ExpiryAlert
-from apps.users.models import User
+from .models import ExpiryAlert, ExpiryTimeline
+from apps.notifications.models import OutboxMessage
+
+TIMELINE_DELETE_CHUNK_SIZE = 500
 
 @shared_task
 def check_expiring_products():
     """
-    Tâche quotidienne pour vérifier les produits qui expirent
-    et créer des alertes
+    Tâche quotidienne pour créer les alertes des lots dont une échéance
+    de péremption est arrivée (entrée dans la fenêtre de notification ou péremption)
+    """
+    today = timezone.localdate()
+
+    due_entries = ExpiryTimeline.objects.filter(due_date__lte=today).order_by().values_list(
+        'id', 'batch_id', 'alert_type', 'batch__expiry_date', 'batch__product__user__is_active'
+    )
+
+    alerts = []
+    processed_ids = []
+    for entry_id, batch_id, alert_type, expiry_date, is_active in due_entries.iterator():
+        processed_ids.append(entry_id)
+        # Un lot déjà périmé n'est signalé que par son alerte de péremption
+        if not is_active or (alert_type == 'EXPIRING_SOON' and expiry_date <= today):
+            continue
+        alerts.append(ExpiryAlert(batch_id=batch_id, alert_type=alert_type, alert_day=today))
+
+    # Les alertes déjà émises aujourd'hui sont ignorées par la contrainte d'unicité
+    ExpiryAlert.objects.bulk_create(alerts, batch_size=1000, ignore_conflicts=True)
+
+    for start in range(0, len(processed_ids), TIMELINE_DELETE_CHUNK_SIZE):
+        ExpiryTimeline.objects.filter(
+            pk__in=processed_ids[start:start + TIMELINE_DELETE_CHUNK_SIZE]
+        ).delete()
+
+    # Alertes du jour pas encore notifiées, quel que soit le passage qui les a créées
+    unsent = ExpiryAlert.objects.filter(
+        alert_day=today,
+        email_sent=False,
+        batch__product__user__notification_email=True
+    ).exclude(batch__product__user__email='').order_by().values_list('id', 'batch__product__user_id')
+    alerts_by_user = defaultdict(list)
+    for alert_id, user_id in unsent.iterator():
+        alerts_by_user[user_id].append(alert_id)
+
+    for user_id, alert_ids in alerts_by_user.items():
+        send_expiry_notification_email.delay(user_id, alert_ids)
+
+    return f"Vérification terminée. {len(alerts)} alertes dues, {len(alerts_by_user)} email(s) programmé(s)."
+
+def _enqueue_expiry_notification(user_id, alert_ids):
+    """
+    Met en file d'envoi l'email des alertes pas encore notifiées et les
+    marque comme envoyées dans la même transaction : une alerte déjà
+    prise par une autre tâche n'est pas notifiée deux fois.
     """
-    today = timezone.now().date()
+    # Une seule requête : alertes, lots, produits et utilisateur
+    alerts = list(
+        ExpiryAlert.objects.filter(
+            id__in=alert_ids,
+            batch__product__user_id=user_id,
+            email_sent=False
+        ).select_for_update(of=('self',), skip_locked=True).select_related(
+            'batch__product__user'
+        ).order_by('batch__expiry_date', 'id')
+    )
+    
+    if not alerts:
+        return "Aucune alerte à envoyer"
     
-    # Pour chaque utilisateur
-    for user in User.objects.filter(is_active=True):
-        days_threshold = user.notification_expiry_days
-        limit_date = today + timedelta(days=days_threshold)
-        
-        # Lots qui expirent bientôt
-        expiring_batches = StockBatch.objects.filter(
-            product__user=user,
-            expiry_date__isnull=False,
-            expiry_date__gt=today,
-            expiry_date__lte=limit_date,
-            quantity__gt=0
-        ).exclude(
-            alerts__alert_type='EXPIRING_SOON',
-            alerts__alert_date__date=today
-        )
-        
-        # Lots expirés
-        expired_batches = StockBatch.objects.filter(
-            product__user=user,
-            expiry_date__isnull=False,
-            expiry_date__lt=today,
-            quantity__gt=0
-        ).exclude(
-            alerts__alert_type='EXPIRED',
-            alerts__alert_date__date=today
-        )
-        
-        # Créer les alertes
-        alerts_created = []
-        
-        for batch in expiring_batches:
-            alert = ExpiryAlert.objects.create(
-                batch=batch,
-                alert_type='EXPIRING_SOON'
-            )
-            alerts_created.append(alert)
-        
-        for batch in expired_batches:
-            alert = ExpiryAlert.objects.create(
-                batch=batch,
-                alert_type='EXPIRED'
-            )
-            alerts_created.append(alert)
-        
-        # Envoyer email si l'utilisateur a activé les notifications
-        if user.notification_email and alerts_created and user.email:
-            send_expiry_notification_email.delay(user.id, [a.id for a in alerts_created])
+    user = alerts[0].batch.product.user
+    today = timezone.localdate()
+    expired = []
+    expiring = []
+    for alert in alerts:
+        if alert.alert_type == 'EXPIRED':
+            expired.append(alert)
+        else:
+            alert.days_left = (alert.batch.expiry_date - today).days
+            expiring.append(alert)
     
-    return f"Vérification terminée. {len(alerts_created)} alertes créées."
+    subject = f"SANEO - {len(alerts)} alerte(s) de péremption"
+    message = render_to_string('stocks/emails/expiry_notification.txt', {
+        'user': user,
+        'expired': expired,
+        'expiring': expiring,
+    })
+    
+    # Mettre l'email en file d'envoi (livré par deliver_outbox)
+    OutboxMessage.objects.enqueue(user, subject, message)
+    
+    # Marquer les alertes comme notifiées
+    ExpiryAlert.objects.filter(id__in=[alert.id for alert in alerts]).update(email_sent=True)
+    
+    return f"Email mis en file d'envoi pour {user.email}"
 
 @shared_task
 def send_expiry_notification_email(user_id, alert_ids):
@@ -71,51 +105,8 @@ def send_expiry_notification_email(user_id, alert_ids):
     Envoyer un email de notification pour les alertes de péremption
     """
     try:
-        user = User.objects.get(id=user_id)
-        alerts = ExpiryAlert.objects.filter(id__in=alert_ids)
-        
-        if not alerts:
-            return "Aucune alerte à envoyer"
-        
-        # Compter les alertes par type
-        expiring_count = alerts.filter(alert_type='EXPIRING_SOON').count()
-        expired_count = alerts.filter(alert_type='EXPIRED').count()
-        
-        # Construire le message
-        subject = f"SANEO - {expiring_count + expired_count} alerte(s) de péremption"
-        
-        message = f"Bonjour {user.first_name or user.username},\n\n"
-        
-        if expired_count > 0:
-            message += f"🔴 {expired_count} produit(s) sont périmés :\n"
-            for alert in alerts.filter(alert_type='EXPIRED'):
-                message += f"  - {alert.batch.product.name} (périmé le {alert.batch.expiry_date})\n"
-            message += "\n"
-        
-        if expiring_count > 0:
-            message += f"⚠️  {expiring_count} produit(s) vont bientôt expirer :\n"
-            for alert in alerts.filter(alert_type='EXPIRING_SOON'):
-                days_left = alert.batch.days_until_expiry
-                message += f"  - {alert.batch.product.name} (expire dans {days_left} jour(s))\n"
-            message += "\n"
-        
-        message += "Connectez-vous à SANEO pour gérer vos stocks.\n\n"
-        message += "Bonne journée !"
-        
-        # Envoyer l'email
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-        )
-        
-        # Marquer les alertes comme envoyées
-        alerts.update(email_sent=True)
-        
-        return f"Email envoyé à {user.email}"
-    
+        with transaction.atomic():
+            return _enqueue_expiry_notification(user_id, alert_ids)
     except Exception as e:
         return f"Erreur lors de l'envoi de l'email: {str(e)}"
 
@@ -1,11 +1,30 @@
+import csv
+import gzip
+import json
+from datetime import date, datetime, timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from apps.products.models import Category, Location, Product
-from apps.stocks.models import StockBatch
+from apps.stocks.models import (
+    DailyConsumption, ExpiryAlert, ExpiryTimeline, InsufficientStockError, ProductStockLevel, StockBatch, StockMovement
+)
+from apps.stocks.projections import StockBatchProjection, StockMovementProjection
+from apps.stocks.serializers import StockBatchSerializer, StockMovementSerializer
+from apps.stocks.services import consume_fefo
+from apps.notifications.models import OutboxMessage
+from apps.stocks.tasks import check_expiring_products, send_expiry_notification_email
 
 
 class StockConsumeApiTests(TestCase):
@@ -56,3 +75,878 @@ class StockConsumeApiTests(TestCase):
 
         self.assertEqual(response.status_code, 400)
         self.assertIn('Quantité insuffisante', response.data['error'])
+
+    def test_out_movement_never_drives_batch_negative(self):
+        # Simule un lot en mémoire périmé : la base fait foi
+        StockBatch.objects.filter(pk=self.batch.pk).update(quantity=Decimal('1.00'))
+
+        with self.assertRaises(InsufficientStockError):
+            StockMovement.objects.create(
+                product=self.product,
+                batch=self.batch,
+                type='OUT',
+                quantity=Decimal('2.00'),
+                user=self.user,
+            )
+
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.quantity, Decimal('1.00'))
+        self.assertFalse(StockMovement.objects.filter(batch=self.batch).exists())
+
+
+class ProductStockLevelTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='ledger_tester',
+            email='ledger_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+        self.location = Location.objects.create(user=self.user, name='frigo', description='Frigo test')
+        self.product = Product.objects.create(
+            user=self.user,
+            name='Yaourt test',
+            category=self.category,
+            default_location=self.location,
+            threshold=Decimal('2.00'),
+        )
+
+    def _level(self):
+        return ProductStockLevel.objects.get(product=self.product)
+
+    def test_level_follows_batch_creation_consumption_and_deletion(self):
+        response = self.client.post(
+            '/api/v1/stocks/batches/',
+            {
+                'product': self.product.id,
+                'quantity': '4',
+                'location': self.location.id,
+                'purchase_date': '2030-01-01',
+                'expiry_date': '2030-01-10',
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        batch = StockBatch.objects.get(product=self.product)
+
+        level = self._level()
+        self.assertEqual(level.quantity, Decimal('4.00'))
+        self.assertEqual(level.batch_count, 1)
+        self.assertEqual(str(level.next_expiry_date), '2030-01-10')
+
+        self.client.post(f'/api/v1/stocks/batches/{batch.id}/consume/', {'quantity': '1.5'}, format='json')
+        self.assertEqual(self._level().quantity, Decimal('2.50'))
+
+        self.client.delete(f'/api/v1/stocks/batches/{batch.id}/')
+        level = self._level()
+        self.assertEqual(level.quantity, Decimal('0'))
+        self.assertEqual(level.batch_count, 0)
+        self.assertIsNone(level.next_expiry_date)
+
+    def test_moving_a_batch_refreshes_both_products(self):
+        other = Product.objects.create(user=self.user, name='Kéfir test', category=self.category)
+        batch = StockBatch.objects.create(product=self.product, quantity=Decimal('3.00'), location=self.location)
+
+        response = self.client.patch(f'/api/v1/stocks/batches/{batch.id}/', {'product': other.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self._level().quantity, Decimal('0'))
+        self.assertEqual(self._level().batch_count, 0)
+        other_level = ProductStockLevel.objects.get(product=other)
+        self.assertEqual((other_level.quantity, other_level.batch_count), (Decimal('3.00'), 1))
+
+    def test_rebuild_stock_levels_recomputes_from_batches(self):
+        StockBatch.objects.create(product=self.product, quantity=Decimal('3.00'), location=self.location)
+        StockBatch.objects.create(product=self.product, quantity=Decimal('1.00'), location=self.location)
+        ProductStockLevel.objects.filter(product=self.product).update(quantity=Decimal('99.00'), batch_count=0)
+
+        call_command('rebuild_stock_levels', stdout=StringIO())
+
+        level = self._level()
+        self.assertEqual(level.quantity, Decimal('4.00'))
+        self.assertEqual(level.batch_count, 2)
+
+    def test_product_deletion_cascades_without_recreating_level(self):
+        StockBatch.objects.create(product=self.product, quantity=Decimal('3.00'), location=self.location)
+
+        self.product.delete()
+
+        self.assertFalse(ProductStockLevel.objects.exists())
+
+
+class FefoConsumptionTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='fefo_tester',
+            email='fefo_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+        self.location = Location.objects.create(user=self.user, name='frigo', description='Frigo test')
+        self.product = Product.objects.create(
+            user=self.user,
+            name='Fromage test',
+            category=self.category,
+            default_location=self.location,
+            threshold=Decimal('1.00'),
+        )
+        self.no_expiry = StockBatch.objects.create(
+            product=self.product, quantity=Decimal('5.00'), location=self.location
+        )
+        self.late = StockBatch.objects.create(
+            product=self.product, quantity=Decimal('2.00'), location=self.location,
+            expiry_date=date(2030, 6, 1)
+        )
+        self.early = StockBatch.objects.create(
+            product=self.product, quantity=Decimal('1.00'), location=self.location,
+            expiry_date=date(2030, 1, 1)
+        )
+
+    def test_consume_stock_uses_earliest_expiry_first(self):
+        response = self.client.post(
+            f'/api/v1/products/{self.product.id}/consume_stock/',
+            {'quantity': '4'},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['movements_created'], 3)
+        self.assertEqual(response.data['remaining_total_stock'], Decimal('4.00'))
+
+        quantities = dict(StockBatch.objects.values_list('pk', 'quantity'))
+        self.assertEqual(quantities[self.early.pk], Decimal('0'))
+        self.assertEqual(quantities[self.late.pk], Decimal('0'))
+        self.assertEqual(quantities[self.no_expiry.pk], Decimal('4.00'))
+        self.assertEqual(ProductStockLevel.objects.get(product=self.product).quantity, Decimal('4.00'))
+
+    def test_consume_fefo_query_count_is_independent_of_batch_count(self):
+        for _ in range(10):
+            StockBatch.objects.create(product=self.product, quantity=Decimal('1.00'), location=self.location)
+
+        # Première sortie du jour : crée la ligne de cumul journalier
+        consume_fefo(self.product, Decimal('0.5'), user=self.user)
+        # Les deux sorties vident au moins un lot (suppression de ses échéances)
+        with CaptureQueriesContext(connection) as single_batch:
+            consume_fefo(self.product, Decimal('0.5'), user=self.user)
+        with CaptureQueriesContext(connection) as many_batches:
+            movements, remaining = consume_fefo(self.product, Decimal('15'), user=self.user)
+
+        self.assertEqual(len(movements), 10)
+        self.assertEqual(remaining, Decimal('2.00'))
+        self.assertEqual(len(many_batches), len(single_batch))
+
+    def test_consume_stock_rejects_quantity_greater_than_available(self):
+        response = self.client.post(
+            f'/api/v1/products/{self.product.id}/consume_stock/',
+            {'quantity': '50'},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Quantité insuffisante', response.data['error'])
+        self.assertFalse(StockMovement.objects.filter(type='OUT').exists())
+
+
+class StockBatchBulkCreateTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='bulk_tester',
+            email='bulk_tester@example.com',
+            password='StrongPass123!'
+        )
+        self.other_user = user_model.objects.create_user(
+            username='bulk_other',
+            email='bulk_other@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+        self.location = Location.objects.create(user=self.user, name='placard', description='Placard test')
+        self.products = [
+            Product.objects.create(user=self.user, name=f'Conserve {i}', category=self.category)
+            for i in range(3)
+        ]
+        self.foreign_product = Product.objects.create(
+            user=self.other_user, name='Conserve voisin', category=self.category
+        )
+
+    def test_bulk_creates_batches_with_in_movements(self):
+        lots = [
+            {'product': product.id, 'quantity': '2', 'location': self.location.id, 'expiry_date': '2030-01-01'}
+            for product in self.products
+        ]
+
+        response = self.client.post('/api/v1/stocks/batches/bulk/', lots, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(StockBatch.objects.filter(quantity=Decimal('2.00')).count(), 3)
+        self.assertEqual(StockMovement.objects.filter(type='IN', quantity=Decimal('2.00')).count(), 3)
+        self.assertEqual(
+            ProductStockLevel.objects.get(product=self.products[0]).quantity, Decimal('2.00')
+        )
+
+    def test_bulk_rejects_everything_when_a_row_is_invalid(self):
+        lots = [
+            {'product': self.products[0].id, 'quantity': '1'},
+            {'product': self.foreign_product.id, 'quantity': '1'},
+            {'product': self.products[1].id, 'quantity': '-1'},
+        ]
+
+        response = self.client.post('/api/v1/stocks/batches/bulk/', lots, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertFalse(StockBatch.objects.exists())
+
+    def test_bulk_allow_partial_keeps_valid_rows(self):
+        lots = [
+            {'product': self.products[0].id, 'quantity': '1'},
+            {'product': self.foreign_product.id, 'quantity': '1'},
+        ]
+
+        response = self.client.post(
+            '/api/v1/stocks/batches/bulk/',
+            {'batches': lots, 'allow_partial': 'true'},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertEqual(StockBatch.objects.get().product, self.products[0])
+
+
+class StockDashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='dashboard_tester',
+            email='dashboard_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+        self.location = Location.objects.create(user=self.user, name='frigo', description='Frigo test')
+        self.product = Product.objects.create(
+            user=self.user,
+            name='Beurre test',
+            category=self.category,
+            default_location=self.location,
+            threshold=Decimal('2.00'),
+        )
+        Product.objects.create(user=self.user, name='Crème test', category=self.category)
+        today = timezone.localdate()
+        StockBatch.objects.create(
+            product=self.product, quantity=Decimal('1.00'), location=self.location,
+            expiry_date=today + timedelta(days=2), purchase_price=Decimal('2.50')
+        )
+        StockBatch.objects.create(
+            product=self.product, quantity=Decimal('0.50'), location=self.location,
+            expiry_date=today - timedelta(days=1), purchase_price=Decimal('1.00')
+        )
+
+    def test_summary_is_computed_in_two_queries_then_served_from_cache(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/stocks/dashboard/summary/')
+
+        self.assertEqual(response.data, {
+            'total_products': 2,
+            'total_batches': 2,
+            'products_below_threshold': 2,
+            'products_out_of_stock': 1,
+            'batches_expiring_soon': 1,
+            'batches_expired': 1,
+            'total_value': '3.50',
+        })
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/v1/stocks/dashboard/summary/')
+        self.assertEqual(cached.data, response.data)
+
+    def test_summary_cache_is_invalidated_by_stock_changes(self):
+        self.client.get('/api/v1/stocks/dashboard/summary/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/v1/stocks/batches/bulk/',
+                [{'product': self.product.id, 'quantity': '3', 'purchase_price': '4.00'}],
+                format='json',
+            )
+
+        response = self.client.get('/api/v1/stocks/dashboard/summary/')
+        self.assertEqual(response.data['total_batches'], 3)
+        self.assertEqual(response.data['products_below_threshold'], 1)
+        self.assertEqual(response.data['total_value'], '7.50')
+
+    def test_cascade_delete_cost_does_not_depend_on_row_count(self):
+        def delete_product_with(movement_count):
+            product = Product.objects.create(user=self.user, name=f'Lait {movement_count}', category=self.category)
+            batch = StockBatch.objects.create(product=product, quantity=Decimal('0'))
+            StockMovement.objects.bulk_create([
+                StockMovement(product=product, batch=batch, type='IN', quantity=Decimal('1'), user=self.user)
+                for _ in range(movement_count)
+            ])
+            with CaptureQueriesContext(connection) as queries:
+                with self.captureOnCommitCallbacks() as callbacks:
+                    product.delete()
+            return len(queries), len(callbacks)
+
+        self.assertEqual(delete_product_with(2), delete_product_with(50))
+
+    def test_user_delete_invalidates_the_cache_once(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.delete()
+        self.assertEqual(len(callbacks), 2)
+
+
+class CachedBatchActionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='cached_tester',
+            email='cached_tester@example.com',
+            password='StrongPass123!'
+        )
+        self.other = user_model.objects.create_user(
+            username='cached_other',
+            email='cached_other@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        category = Category.objects.create(name='frais')
+        self.product = Product.objects.create(user=self.user, name='Lait test', category=category)
+        self.batch = StockBatch.objects.create(
+            product=self.product, quantity=Decimal('2.00'),
+            expiry_date=timezone.localdate() + timedelta(days=3)
+        )
+
+    def test_to_consume_first_is_served_from_cache_per_user(self):
+        response = self.client.get('/api/v1/stocks/batches/to_consume_first/')
+        self.assertEqual([row['id'] for row in response.data], [self.batch.id])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/v1/stocks/batches/to_consume_first/')
+        self.assertEqual(cached.data, response.data)
+
+        self.client.force_authenticate(self.other)
+        response = self.client.get('/api/v1/stocks/batches/to_consume_first/')
+        self.assertEqual(response.data, [])
+
+    def test_query_parameters_are_part_of_the_cache_key(self):
+        response = self.client.get('/api/v1/stocks/batches/expiring_soon/', {'days': 7})
+        self.assertEqual(len(response.data), 1)
+
+        response = self.client.get('/api/v1/stocks/batches/expiring_soon/', {'days': 1})
+        self.assertEqual(response.data, [])
+
+    def test_stock_changes_invalidate_cached_actions(self):
+        self.client.get('/api/v1/stocks/batches/expiring_soon/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f'/api/v1/stocks/batches/{self.batch.id}/consume/', {'quantity': '2'}, format='json'
+            )
+
+        response = self.client.get('/api/v1/stocks/batches/expiring_soon/')
+        self.assertEqual(response.data, [])
+
+
+class StockProjectionParityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='projection_tester',
+            email='projection_tester@example.com',
+            password='StrongPass123!',
+            first_name='Élodie'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        today = timezone.localdate()
+        category = Category.objects.create(name='nourriture')
+        location = Location.objects.create(user=self.user, name='congelateur', description='Congélateur test')
+        product = Product.objects.create(user=self.user, name='Épinards « bio »', category=category, unit='g')
+        other = Product.objects.create(user=self.user, name='Eau', category=category, unit='l')
+
+        StockBatch.objects.create(
+            product=product, quantity=Decimal('250'), location=location, expiry_date=today - timedelta(days=2),
+            purchase_price=Decimal('3.1'), supplier='Marché', notes='Surgelé\nlot du jour'
+        )
+        batch = StockBatch.objects.create(
+            product=product, quantity=Decimal('0.5'), expiry_date=today + timedelta(days=10)
+        )
+        StockBatch.objects.create(product=other, quantity=Decimal('6'), purchase_date=today - timedelta(days=40))
+
+        StockMovement.objects.create(product=other, type='ADJUST', quantity=Decimal('1'), user=self.user)
+        consume_fefo(product, Decimal('0.25'), self.user, note='Repas', batch_ids=[batch.id])
+
+    def assertSameJSON(self, serializer_class, projection_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+        projection = projection_class()
+        self.assertEqual(JSONRenderer().render(projection.project(projection.values(queryset))), expected)
+
+    def test_batch_projection_matches_serializer(self):
+        queryset = StockBatch.objects.select_related('product', 'location').order_by('id')
+        self.assertSameJSON(StockBatchSerializer, StockBatchProjection, queryset)
+        with timezone.override('Pacific/Auckland'):
+            self.assertSameJSON(StockBatchSerializer, StockBatchProjection, queryset)
+
+    def test_movement_projection_matches_serializer(self):
+        queryset = StockMovement.objects.select_related('product', 'batch', 'user').order_by('id')
+        self.assertSameJSON(StockMovementSerializer, StockMovementProjection, queryset)
+
+        self.user.first_name = ''
+        self.user.last_name = 'Martin'
+        self.user.save()
+        self.assertSameJSON(StockMovementSerializer, StockMovementProjection, queryset)
+
+    def test_list_and_read_actions_use_projection(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/stocks/batches/', {'ordering': 'quantity'})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            [row['quantity'] for row in response.data['results']], ['0.25', '6.00', '250.00']
+        )
+        self.assertNotIn('location_name', response.data['results'][0])
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/stocks/batches/expired/')
+        self.assertEqual(response.data[0]['location_name'], 'Congélateur')
+        self.assertTrue(response.data[0]['is_expired'])
+
+        response = self.client.get('/api/v1/stocks/movements/recent/')
+        self.assertEqual(
+            {(row['type_display'], row['user_name']) for row in response.data},
+            {('Ajustement', 'Élodie'), ('Sortie', 'Élodie')}
+        )
+
+
+class DailyConsumptionTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='rollup_tester',
+            email='rollup_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='boisson')
+        self.location = Location.objects.create(user=self.user, name='cave', description='Cave test')
+        self.product = Product.objects.create(user=self.user, name='Eau test', category=self.category)
+        self.batch = StockBatch.objects.create(
+            product=self.product, quantity=Decimal('10.00'), location=self.location
+        )
+
+    def test_out_movements_feed_the_daily_rollup(self):
+        self.client.post(f'/api/v1/stocks/batches/{self.batch.id}/consume/', {'quantity': '2'}, format='json')
+        self.client.post(f'/api/v1/products/{self.product.id}/consume_stock/', {'quantity': '1'}, format='json')
+        StockMovement.objects.create(
+            product=self.product, batch=self.batch, type='OUT', quantity=Decimal('0.50'), user=self.user
+        )
+
+        rollup = DailyConsumption.objects.get(product=self.product)
+        self.assertEqual(rollup.day, timezone.localdate())
+        self.assertEqual(rollup.user, self.user)
+        self.assertEqual(rollup.quantity, Decimal('3.50'))
+        self.assertEqual(rollup.count, 3)
+
+        response = self.client.get('/api/v1/stocks/dashboard/consumption_stats/?days=30')
+        self.assertEqual(response.data, [{
+            'product__name': 'Eau test',
+            'product__id': self.product.id,
+            'total_consumed': Decimal('3.50'),
+            'count': 3,
+        }])
+
+    def test_movement_update_and_delete_adjust_the_rollup(self):
+        first = StockMovement.objects.create(
+            product=self.product, batch=self.batch, type='OUT', quantity=Decimal('2.00'), user=self.user
+        )
+        second = StockMovement.objects.create(
+            product=self.product, batch=self.batch, type='OUT', quantity=Decimal('1.00'), user=self.user
+        )
+
+        response = self.client.patch(
+            f'/api/v1/stocks/movements/{first.id}/', {'quantity': '3.50'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        rollup = DailyConsumption.objects.get(product=self.product)
+        self.assertEqual((rollup.quantity, rollup.count), (Decimal('4.50'), 2))
+
+        self.client.patch(f'/api/v1/stocks/movements/{second.id}/', {'type': 'IN'}, format='json')
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.quantity, rollup.count), (Decimal('3.50'), 1))
+
+        response = self.client.delete(f'/api/v1/stocks/movements/{first.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(DailyConsumption.objects.filter(product=self.product).exists())
+
+        response = self.client.get('/api/v1/stocks/dashboard/consumption_stats/?days=30')
+        self.assertEqual(response.data, [])
+
+    def test_consumption_window_counts_days_calendar_days(self):
+        now = timezone.now()
+        for days_ago, quantity in ((6, '1.00'), (7, '5.00')):
+            StockMovement.objects.create(
+                product=self.product, batch=self.batch, type='OUT', quantity=Decimal(quantity),
+                date=now - timedelta(days=days_ago), user=self.user
+            )
+
+        response = self.client.get('/api/v1/stocks/dashboard/consumption_stats/?days=7')
+        self.assertEqual(response.data[0]['total_consumed'], Decimal('1.00'))
+        self.assertEqual(response.data[0]['count'], 1)
+
+    def test_direct_model_writes_adjust_the_rollup(self):
+        movement = StockMovement.objects.create(
+            product=self.product, batch=self.batch, type='OUT', quantity=Decimal('2.00'), user=self.user
+        )
+        StockMovement.objects.create(
+            product=self.product, batch=self.batch, type='OUT', quantity=Decimal('1.00'), user=self.user
+        )
+
+        # Chemins de l'admin : enregistrement du modèle et suppression par queryset
+        movement = StockMovement.objects.get(pk=movement.pk)
+        movement.quantity = Decimal('4.00')
+        movement.save()
+        rollup = DailyConsumption.objects.get(product=self.product)
+        self.assertEqual((rollup.quantity, rollup.count), (Decimal('5.00'), 2))
+
+        StockMovement.objects.filter(pk=movement.pk).delete()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.quantity, rollup.count), (Decimal('1.00'), 1))
+
+        self.product.delete()
+        self.assertFalse(DailyConsumption.objects.exists())
+
+    def test_backfill_rebuilds_rollup_from_movements(self):
+        old_date = timezone.now() - timedelta(days=40)
+        for quantity in ('1.00', '2.00'):
+            StockMovement.objects.create(
+                product=self.product, batch=self.batch, type='OUT',
+                quantity=Decimal(quantity), date=old_date, user=self.user
+            )
+        DailyConsumption.objects.all().delete()
+
+        call_command('backfill_daily_consumption', stdout=StringIO())
+
+        rollup = DailyConsumption.objects.get(product=self.product)
+        self.assertEqual(rollup.day, timezone.localdate(old_date))
+        self.assertEqual(rollup.quantity, Decimal('3.00'))
+        self.assertEqual(rollup.count, 2)
+
+
+class StockMovementTimeseriesTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='timeseries_tester',
+            email='timeseries_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+        self.product = Product.objects.create(user=self.user, name='Pain test', category=self.category)
+        self.batch = StockBatch.objects.create(product=self.product, quantity=Decimal('0'))
+
+        tz = timezone.get_current_timezone()
+        for day, movement_type, quantity in [
+            (datetime(2030, 1, 30, 10, tzinfo=tz), 'IN', '5.00'),
+            (datetime(2030, 1, 30, 18, tzinfo=tz), 'OUT', '1.00'),
+            (datetime(2030, 1, 31, 9, tzinfo=tz), 'OUT', '1.50'),
+            (datetime(2030, 2, 2, 9, tzinfo=tz), 'ADJUST', '2.00'),
+        ]:
+            StockMovement.objects.create(
+                product=self.product, batch=self.batch, type=movement_type,
+                quantity=Decimal(quantity), date=day, user=self.user
+            )
+
+    def test_daily_buckets(self):
+        response = self.client.get(f'/api/v1/stocks/movements/timeseries/?product={self.product.id}&bucket=day')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['period'], row['total_in'], row['total_out'], row['movements']) for row in response.data],
+            [
+                ('2030-01-30', '5.00', '1.00', 2),
+                ('2030-01-31', '0.00', '1.50', 1),
+                ('2030-02-02', '0.00', '0.00', 1),
+            ]
+        )
+
+    def test_monthly_buckets_with_type_and_date_filters(self):
+        response = self.client.get(
+            '/api/v1/stocks/movements/timeseries/?bucket=month&type=OUT&date_from=2030-01-31'
+        )
+
+        self.assertEqual(response.data, [{
+            'period': '2030-01-01',
+            'total_in': '0.00',
+            'total_out': '1.50',
+            'total_adjust': '0.00',
+            'movements': 1,
+        }])
+
+    def test_rejects_unknown_bucket(self):
+        response = self.client.get('/api/v1/stocks/movements/timeseries/?bucket=year')
+        self.assertEqual(response.status_code, 400)
+
+
+class StockMovementExportTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='export_tester',
+            email='export_tester@example.com',
+            password='StrongPass123!'
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.category = Category.objects.create(name='nourriture')
+        self.product = Product.objects.create(user=self.user, name='Café, moulu', category=self.category)
+        self.other = Product.objects.create(user=self.user, name='Thé test', category=self.category)
+        self.batch = StockBatch.objects.create(product=self.product, quantity=Decimal('0'))
+        StockMovement.objects.create(
+            product=self.product, batch=self.batch, type='IN', quantity=Decimal('3.00'), user=self.user
+        )
+        StockMovement.objects.create(
+            product=self.product, batch=self.batch, type='OUT', quantity=Decimal('1.25'),
+            note='Petit "déjeuner"', user=self.user
+        )
+        StockMovement.objects.create(product=self.other, type='IN', quantity=Decimal('1.00'), user=self.user)
+
+    def test_csv_export_streams_filtered_rows(self):
+        response = self.client.get(f'/api/v1/stocks/movements/export/?product={self.product.id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row['type'] for row in rows}, {'IN', 'OUT'})
+        out_row = next(row for row in rows if row['type'] == 'OUT')
+        self.assertEqual(out_row['product_name'], 'Café, moulu')
+        self.assertEqual(out_row['quantity'], '1.25')
+        self.assertEqual(out_row['note'], 'Petit "déjeuner"')
+
+    def test_ndjson_export_with_gzip(self):
+        response = self.client.get('/api/v1/stocks/movements/export/?output=ndjson&gzip=true&type=IN')
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(sorted(row['product_name'] for row in rows), ['Café, moulu', 'Thé test'])
+        self.assertEqual({row['quantity'] for row in rows}, {'3.00', '1.00'})
+        self.assertEqual(rows[0]['user'], 'export_tester')
+
+
+class ExpiryAlertGenerationTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.today = timezone.localdate()
+        self.category = Category.objects.create(name='frais')
+
+        self.user = user_model.objects.create_user(
+            username='alert_tester',
+            email='alert_tester@example.com',
+            password='StrongPass123!',
+            notification_expiry_days=3
+        )
+        self.other = user_model.objects.create_user(
+            username='alert_other',
+            email='alert_other@example.com',
+            password='StrongPass123!',
+            notification_expiry_days=10,
+            notification_email=False
+        )
+        self.inactive = user_model.objects.create_user(
+            username='alert_inactive',
+            email='alert_inactive@example.com',
+            password='StrongPass123!',
+            is_active=False
+        )
+
+        self.expired = self._create_batch(self.user, -2)
+        self.expiring = self._create_batch(self.user, 2)
+        self._create_batch(self.user, 7)
+        self._create_batch(self.user, -1, quantity='0')
+        self.other_expiring = self._create_batch(self.other, 7)
+        self._create_batch(self.inactive, -1)
+
+    def _create_batch(self, user, days, quantity='1.00'):
+        product = Product.objects.create(user=user, name=f'Yaourt {days}', category=self.category)
+        return StockBatch.objects.create(
+            product=product,
+            quantity=Decimal(quantity),
+            expiry_date=self.today + timedelta(days=days)
+        )
+
+    def test_alerts_use_each_user_window_and_notify_once(self):
+        with mock.patch('apps.stocks.tasks.send_expiry_notification_email.delay') as delay:
+            result = check_expiring_products()
+
+        self.assertEqual(result, 'Vérification terminée. 3 alertes dues, 1 email(s) programmé(s).')
+        alerts = {
+            (alert.batch_id, alert.alert_type)
+            for alert in ExpiryAlert.objects.filter(alert_day=self.today)
+        }
+        self.assertEqual(alerts, {
+            (self.expired.id, 'EXPIRED'),
+            (self.expiring.id, 'EXPIRING_SOON'),
+            (self.other_expiring.id, 'EXPIRING_SOON'),
+        })
+
+        # Un seul envoi, pour l'utilisateur ayant activé les notifications
+        delay.assert_called_once()
+        user_id, alert_ids = delay.call_args.args
+        self.assertEqual(user_id, self.user.id)
+        self.assertEqual(
+            set(ExpiryAlert.objects.filter(id__in=alert_ids).values_list('batch_id', flat=True)),
+            {self.expired.id, self.expiring.id}
+        )
+
+    def test_second_run_same_day_is_idempotent(self):
+        with mock.patch('apps.stocks.tasks.send_expiry_notification_email.delay') as delay:
+            check_expiring_products()
+            send_expiry_notification_email(*delay.call_args.args)
+            delay.reset_mock()
+            with self.assertNumQueries(2):
+                result = check_expiring_products()
+
+        self.assertEqual(result, 'Vérification terminée. 0 alertes dues, 0 email(s) programmé(s).')
+        self.assertEqual(ExpiryAlert.objects.count(), 3)
+        delay.assert_not_called()
+
+    def test_expired_batch_is_alerted_once_not_daily(self):
+        with mock.patch('apps.stocks.tasks.send_expiry_notification_email.delay'):
+            check_expiring_products()
+            with mock.patch('apps.stocks.tasks.timezone.localdate', return_value=self.today + timedelta(days=1)):
+                check_expiring_products()
+
+        # Une alerte par franchissement : pas de nouvelle alerte EXPIRED le lendemain
+        self.assertEqual(
+            list(ExpiryAlert.objects.filter(batch=self.expired).values_list('alert_type', 'alert_day')),
+            [('EXPIRED', self.today)]
+        )
+        self.assertFalse(ExpiryTimeline.objects.filter(batch=self.expired).exists())
+
+    def test_saving_user_without_settings_change_does_not_reschedule(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.first_name = 'Alice'
+        with self.captureOnCommitCallbacks():
+            with self.assertNumQueries(1):
+                user.save()
+
+    def test_timeline_follows_batch_quantity_and_user_settings(self):
+        batch = self._create_batch(self.user, 20)
+        self.assertEqual(
+            dict(ExpiryTimeline.objects.filter(batch=batch).values_list('alert_type', 'due_date')),
+            {
+                'EXPIRING_SOON': self.today + timedelta(days=17),
+                'EXPIRED': self.today + timedelta(days=21),
+            }
+        )
+
+        self.user.notification_expiry_days = 5
+        self.user.save()
+        self.assertEqual(
+            ExpiryTimeline.objects.get(batch=batch, alert_type='EXPIRING_SOON').due_date,
+            self.today + timedelta(days=15)
+        )
+
+        consume_fefo(batch.product, Decimal('1.00'), user=self.user)
+        self.assertFalse(ExpiryTimeline.objects.filter(batch=batch).exists())
+
+        StockMovement.objects.create(
+            product=batch.product, batch=batch, type='IN', quantity=Decimal('2.00'), user=self.user
+        )
+        self.assertEqual(ExpiryTimeline.objects.filter(batch=batch).count(), 2)
+
+    def test_alerted_crossings_are_not_rescheduled(self):
+        with mock.patch('apps.stocks.tasks.send_expiry_notification_email.delay'):
+            check_expiring_products()
+
+        self.assertFalse(ExpiryTimeline.objects.filter(batch=self.expiring, alert_type='EXPIRING_SOON').exists())
+        self.expiring.notes = 'Modifié'
+        self.expiring.save()
+        self.assertEqual(
+            list(ExpiryTimeline.objects.filter(batch=self.expiring).values_list('alert_type', flat=True)),
+            ['EXPIRED']
+        )
+
+    def test_notification_email_query_count_does_not_depend_on_alert_count(self):
+        with mock.patch('apps.stocks.tasks.send_expiry_notification_email.delay'):
+            check_expiring_products()
+        alert_ids = list(ExpiryAlert.objects.filter(batch__product__user=self.user).values_list('id', flat=True))
+
+        with self.assertNumQueries(5):
+            send_expiry_notification_email(self.user.id, alert_ids[:1])
+        ExpiryAlert.objects.update(email_sent=False)
+
+        for days in (1, 4, 5, -3, -4):
+            batch = self._create_batch(self.user, days)
+            ExpiryAlert.objects.create(batch=batch, alert_type='EXPIRED' if days < 0 else 'EXPIRING_SOON')
+        alert_ids = list(ExpiryAlert.objects.filter(batch__product__user=self.user).values_list('id', flat=True))
+
+        with self.assertNumQueries(5):
+            send_expiry_notification_email(self.user.id, alert_ids)
+
+        message = OutboxMessage.objects.filter(user=self.user).latest('id')
+        self.assertEqual(message.subject, 'SANEO - 7 alerte(s) de péremption')
+        self.assertIn('🔴 3 produit(s) sont périmés :', message.body)
+        self.assertIn(f'  - Yaourt -2 (périmé le {self.expired.expiry_date})\n', message.body)
+        self.assertIn('⚠️  4 produit(s) vont bientôt expirer :', message.body)
+        self.assertIn('  - Yaourt 2 (expire dans 2 jour(s))\n', message.body)
+        self.assertFalse(ExpiryAlert.objects.filter(id__in=alert_ids, email_sent=False).exists())
+
+    def test_overlapping_runs_notify_each_alert_once(self):
+        with mock.patch('apps.stocks.tasks.send_expiry_notification_email.delay') as delay:
+            check_expiring_products()
+            # Nouvelle échéance arrivée entre deux passages, avant l'envoi du premier email
+            self._create_batch(self.user, 1)
+            check_expiring_products()
+
+        self.assertEqual(delay.call_count, 2)
+        for call in delay.call_args_list:
+            send_expiry_notification_email(*call.args)
+
+        messages = OutboxMessage.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [message.subject for message in messages],
+            ['SANEO - 2 alerte(s) de péremption', 'SANEO - 1 alerte(s) de péremption']
+        )
+        self.assertFalse(ExpiryAlert.objects.filter(batch__product__user=self.user, email_sent=False).exists())
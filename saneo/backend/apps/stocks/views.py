@@ -3,28 +3,43 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, Value, DateField
+from django.db.models.functions import Coalesce, TruncDay, TruncWeek, TruncMonth
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal, InvalidOperation
-from .models import StockBatch, StockMovement, ExpiryAlert
+from apps.products.models import Location, Product
+from .models import StockBatch, StockMovement, ExpiryAlert, DailyConsumption, InsufficientStockError
 from .serializers import (
-    StockBatchSerializer, StockBatchCreateSerializer,
+    StockBatchSerializer, StockBatchCreateSerializer, StockBatchBulkItemSerializer,
     StockMovementSerializer, StockMovementCreateSerializer,
-    ExpiryAlertSerializer, StockSummarySerializer
+    ExpiryAlertSerializer, StockSummarySerializer, StockMovementTimeseriesSerializer
 )
+from .exports import csv_lines, ndjson_lines, encode_blocks
+from .filters import StockMovementFilter
+from apps.core.cache import cached_per_user
+from apps.core.projections import ProjectionMixin
+from .cache import DASHBOARD_CACHE_TIMEOUT, dashboard_cache_key
+from .projections import StockBatchProjection, StockMovementProjection
+from .services import consume_fefo, create_batches
 
-class StockBatchViewSet(viewsets.ModelViewSet):
+class StockBatchViewSet(ProjectionMixin, viewsets.ModelViewSet):
     """
     ViewSet pour les lots de stock
     """
     permission_classes = [IsAuthenticated]
+    projection_class = StockBatchProjection
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['product', 'location']
     search_fields = ['product__name', 'supplier', 'notes']
     ordering_fields = ['expiry_date', 'quantity', 'purchase_date', 'created_at']
     ordering = ['expiry_date']
     
+    # Nombre maximal de lots par saisie groupée
+    BULK_MAX_BATCHES = 200
+    
     def get_queryset(self):
         return StockBatch.objects.filter(
             product__user=self.request.user
@@ -35,7 +50,79 @@ class StockBatchViewSet(viewsets.ModelViewSet):
             return StockBatchCreateSerializer
         return StockBatchSerializer
     
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Création groupée de lots (retour de courses).
+        Accepte une liste de lots ou {"batches": [...], "allow_partial": true}.
+        """
+        payload = request.data
+        allow_partial_raw = False
+        if isinstance(payload, dict):
+            allow_partial_raw = payload.get('allow_partial', False)
+            payload = payload.get('batches')
+        if isinstance(allow_partial_raw, str):
+            allow_partial = allow_partial_raw.strip().lower() in ['1', 'true', 'yes', 'on']
+        else:
+            allow_partial = bool(allow_partial_raw)
+        
+        if not isinstance(payload, list) or not payload:
+            return Response(
+                {'error': 'Liste de lots requise'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(payload) > self.BULK_MAX_BATCHES:
+            return Response(
+                {'error': f'{self.BULK_MAX_BATCHES} lots maximum par requête'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Produits et emplacements référencés chargés en une requête chacun
+        def referenced_ids(key):
+            ids = set()
+            for row in payload:
+                if isinstance(row, dict):
+                    try:
+                        ids.add(int(row.get(key)))
+                    except (TypeError, ValueError):
+                        pass
+            return ids
+        
+        context = {
+            'request': request,
+            'products': Product.objects.filter(
+                user=request.user, pk__in=referenced_ids('product')
+            ).in_bulk(),
+            'locations': Location.objects.filter(
+                user=request.user, pk__in=referenced_ids('location')
+            ).in_bulk(),
+        }
+        
+        lots = []
+        errors = []
+        for index, row in enumerate(payload):
+            serializer = StockBatchBulkItemSerializer(data=row, context=context)
+            if serializer.is_valid():
+                lots.append(serializer.validated_data)
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        
+        if errors and (not allow_partial or not lots):
+            return Response(
+                {'created': 0, 'batches': [], 'errors': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        batches = create_batches(request.user, lots)
+        
+        return Response({
+            'created': len(batches),
+            'batches': StockBatchSerializer(batches, many=True).data,
+            'errors': errors
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=False, methods=['get'])
+    @cached_per_user('stocks:expiring_soon', ttl=15 * 60)
     def expiring_soon(self, request):
         """Lots qui expirent bientôt"""
         days = int(request.query_params.get('days', 7))
@@ -49,10 +136,10 @@ class StockBatchViewSet(viewsets.ModelViewSet):
             quantity__gt=0
         )
         
-        serializer = self.get_serializer(batches, many=True)
-        return Response(serializer.data)
+        return self.projected_response(batches)
     
     @action(detail=False, methods=['get'])
+    @cached_per_user('stocks:expired', ttl=15 * 60)
     def expired(self, request):
         """Lots expirés"""
         today = timezone.now().date()
@@ -63,10 +150,10 @@ class StockBatchViewSet(viewsets.ModelViewSet):
             quantity__gt=0
         )
         
-        serializer = self.get_serializer(batches, many=True)
-        return Response(serializer.data)
+        return self.projected_response(batches)
     
     @action(detail=False, methods=['get'])
+    @cached_per_user('stocks:to_consume_first', ttl=15 * 60)
     def to_consume_first(self, request):
         """Lots à consommer en priorité (triés par date de péremption)"""
         batches = self.get_queryset().filter(
@@ -74,8 +161,7 @@ class StockBatchViewSet(viewsets.ModelViewSet):
             quantity__gt=0
         ).order_by('expiry_date')[:20]
         
-        serializer = self.get_serializer(batches, many=True)
-        return Response(serializer.data)
+        return self.projected_response(batches)
     
     @action(detail=True, methods=['post'])
     def consume(self, request, pk=None):
@@ -111,31 +197,59 @@ class StockBatchViewSet(viewsets.ModelViewSet):
             )
         
         # Créer un mouvement de sortie
-        movement = StockMovement.objects.create(
-            product=batch.product,
-            batch=batch,
-            type='OUT',
-            quantity=quantity,
-            user=request.user,
-            note=request.data.get('note', 'Consommation')
-        )
+        try:
+            movements, remaining = consume_fefo(
+                batch.product,
+                quantity,
+                user=request.user,
+                note=request.data.get('note', 'Consommation'),
+                batch_ids=[batch.pk]
+            )
+        except InsufficientStockError as e:
+            # Le lot a été consommé entre-temps par une autre requête
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'message': 'Consommation enregistrée',
-            'remaining': batch.quantity,
-            'movement': StockMovementSerializer(movement).data
+            'remaining': remaining,
+            'movement': StockMovementSerializer(movements[0]).data
         })
 
-class StockMovementViewSet(viewsets.ModelViewSet):
+class StockMovementViewSet(ProjectionMixin, viewsets.ModelViewSet):
     """
     ViewSet pour les mouvements de stock
     """
     permission_classes = [IsAuthenticated]
+    projection_class = StockMovementProjection
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['product', 'type', 'batch']
+    filterset_class = StockMovementFilter
     ordering_fields = ['date', 'created_at']
     ordering = ['-date']
     
+    # Colonnes exportées et champs correspondants
+    EXPORT_FIELDS = {
+        'id': 'id',
+        'date': 'date',
+        'product': 'product_id',
+        'product_name': 'product__name',
+        'batch': 'batch_id',
+        'type': 'type',
+        'quantity': 'quantity',
+        'note': 'note',
+        'user': 'user__username',
+    }
+    EXPORT_CHUNK_SIZE = 2000
+    
+    # Troncature des dates par granularité de série temporelle
+    TIMESERIES_BUCKETS = {
+        'day': TruncDay,
+        'week': TruncWeek,
+        'month': TruncMonth,
+    }
+    
     def get_queryset(self):
         return StockMovement.objects.filter(
             product__user=self.request.user
@@ -153,8 +267,7 @@ class StockMovementViewSet(viewsets.ModelViewSet):
         since = timezone.now() - timedelta(days=days)
         
         movements = self.get_queryset().filter(date__gte=since)
-        serializer = self.get_serializer(movements, many=True)
-        return Response(serializer.data)
+        return self.projected_response(movements)
     
     @action(detail=False, methods=['get'])
     def by_product(self, request):
@@ -167,7 +280,63 @@ class StockMovementViewSet(viewsets.ModelViewSet):
             )
         
         movements = self.get_queryset().filter(product_id=product_id)
-        serializer = self.get_serializer(movements, many=True)
+        return self.projected_response(movements)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Export en flux des mouvements filtrés (output=csv ou ndjson, gzip=true).
+        Les lignes sont lues par blocs, sans instancier de modèles.
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response(
+                {'error': 'Format invalide. Valeurs possibles : csv, ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compress = request.query_params.get('gzip', '').strip().lower() in ['1', 'true', 'yes', 'on']
+        
+        rows = self.filter_queryset(self.get_queryset()).values_list(
+            *self.EXPORT_FIELDS.values()
+        ).iterator(chunk_size=self.EXPORT_CHUNK_SIZE)
+        header = list(self.EXPORT_FIELDS)
+        lines = csv_lines(header, rows) if output == 'csv' else ndjson_lines(header, rows)
+        
+        filename = f'mouvements.{output}'
+        content_type = 'text/csv; charset=utf-8' if output == 'csv' else 'application/x-ndjson; charset=utf-8'
+        if compress:
+            filename += '.gz'
+            content_type = 'application/gzip'
+        
+        response = StreamingHttpResponse(encode_blocks(lines, compress=compress), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """
+        Totaux d'entrées, sorties et ajustements par période (day, week, month),
+        calculés en base. Accepte les mêmes filtres que la liste.
+        """
+        bucket = request.query_params.get('bucket', 'day')
+        trunc = self.TIMESERIES_BUCKETS.get(bucket)
+        if trunc is None:
+            return Response(
+                {'error': f"Période invalide. Valeurs possibles : {', '.join(self.TIMESERIES_BUCKETS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        zero = Value(Decimal('0'))
+        rows = self.filter_queryset(self.get_queryset()).order_by().annotate(
+            period=trunc('date', output_field=DateField())
+        ).values('period').annotate(
+            total_in=Coalesce(Sum('quantity', filter=Q(type='IN')), zero),
+            total_out=Coalesce(Sum('quantity', filter=Q(type='OUT')), zero),
+            total_adjust=Coalesce(Sum('quantity', filter=Q(type='ADJUST')), zero),
+            movements=Count('id')
+        ).order_by('period')
+        
+        serializer = StockMovementTimeseriesSerializer(rows, many=True)
         return Response(serializer.data)
 
 class ExpiryAlertViewSet(viewsets.ReadOnlyModelViewSet):
@@ -217,49 +386,53 @@ class StockDashboardViewSet(viewsets.ViewSet):
         """Résumé global du stock"""
         user = request.user
         
-        from apps.products.models import Product
-        
-        products = Product.objects.filter(user=user)
-        batches = StockBatch.objects.filter(product__user=user, quantity__gt=0)
-        
         today = timezone.now().date()
         days = user.notification_expiry_days
         
-        summary = {
-            'total_products': products.count(),
-            'total_batches': batches.count(),
-            'products_below_threshold': sum(1 for p in products if p.is_below_threshold),
-            'products_out_of_stock': sum(1 for p in products if p.total_stock == 0),
-            'batches_expiring_soon': batches.filter(
-                expiry_date__isnull=False,
+        cache_key = dashboard_cache_key(user, today)
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+        
+        product_stats = Product.objects.filter(user=user).with_stock().aggregate(
+            total_products=Count('id'),
+            products_below_threshold=Count('id', filter=Q(below_threshold=True)),
+            products_out_of_stock=Count('id', filter=Q(current_stock=0))
+        )
+        batch_stats = StockBatch.objects.filter(
+            product__user=user,
+            quantity__gt=0
+        ).aggregate(
+            total_batches=Count('id'),
+            batches_expiring_soon=Count('id', filter=Q(
                 expiry_date__gt=today,
                 expiry_date__lte=today + timedelta(days=days)
-            ).count(),
-            'batches_expired': batches.filter(
-                expiry_date__isnull=False,
-                expiry_date__lt=today
-            ).count(),
-            'total_value': batches.aggregate(
-                total=Sum('purchase_price')
-            )['total'] or 0
-        }
+            )),
+            batches_expired=Count('id', filter=Q(expiry_date__lt=today)),
+            total_value=Sum('purchase_price')
+        )
+        
+        summary = {**product_stats, **batch_stats}
+        summary['total_value'] = summary['total_value'] or 0
         
         serializer = StockSummarySerializer(summary)
+        cache.set(cache_key, dict(serializer.data), DASHBOARD_CACHE_TIMEOUT)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def consumption_stats(self, request):
         """Statistiques de consommation"""
         days = int(request.query_params.get('days', 30))
-        since = timezone.now() - timedelta(days=days)
+        # Fenêtre de `days` jours calendaires, aujourd'hui compris
+        since = timezone.localdate() - timedelta(days=days - 1)
         
-        movements = StockMovement.objects.filter(
-            product__user=request.user,
-            type='OUT',
-            date__gte=since
+        # Lecture du cumul journalier : au plus une ligne par produit et par jour
+        stats = DailyConsumption.objects.filter(
+            user=request.user,
+            day__gte=since
         ).values('product__name', 'product__id').annotate(
             total_consumed=Sum('quantity'),
-            count=Count('id')
+            count=Sum('count')
         ).order_by('-total_consumed')[:10]
         
-        return Response(list(movements))
+        return Response(list(stats))
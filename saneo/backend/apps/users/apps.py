@@ -4,3 +4,6 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
     verbose_name = 'Utilisateurs'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
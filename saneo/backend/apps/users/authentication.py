@@ -0,0 +1,50 @@
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .cache import AUTH_USER_CACHE_TIMEOUT, AUTH_USER_CACHED_FIELDS, auth_user_cache_key
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Authentification JWT qui résout l'utilisateur depuis le cache.
+    Seuls les comptes actifs sont mis en cache ; la clé dépend de la
+    version du compte, incrémentée à chaque enregistrement ou suppression
+    de l'utilisateur (mot de passe, désactivation, profil).
+
+    Le cache ne contient que AUTH_USER_CACHED_FIELDS, jamais le mot de
+    passe : l'utilisateur est reconstruit avec les autres champs différés,
+    chargés à la demande. L'invalidation n'est vue par tous les workers
+    que si le cache est partagé (CACHE_URL).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = auth_user_cache_key(user_id)
+        values = cache.get(key)
+        if values is not None:
+            return self._from_cache(values)
+
+        # Lève AuthenticationFailed si le compte est introuvable ou désactivé
+        user = super().get_user(validated_token)
+        cache.set(key, {name: getattr(user, name) for name in AUTH_USER_CACHED_FIELDS}, AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    def _from_cache(self, values):
+        """Utilisateur non modifié en base, les champs absents du cache étant différés"""
+        field_names = [
+            field.attname for field in self.user_model._meta.concrete_fields if field.attname in values
+        ]
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model), field_names, [values[name] for name in field_names]
+        )
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Documente CachedJWTAuthentication comme l'authentification JWT standard"""
+    target_class = 'apps.users.authentication.CachedJWTAuthentication'
@@ -0,0 +1,124 @@
+import hashlib
+import math
+import threading
+import time
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .cache import get_blacklist_version
+
+# Capacité minimale du filtre et taux de faux positifs visé
+FILTER_CAPACITY = 100_000
+FILTER_ERROR_RATE = 0.01
+# Reconstruction complète périodique : oublie les tokens expirés ou retirés à la main
+FULL_RELOAD_INTERVAL = 24 * 60 * 60
+# Recouvrement des synchronisations incrémentales (en identifiants) : couvre
+# les quelques transactions concurrentes validées dans le désordre de leur séquence
+SYNC_ID_OVERLAP = 20
+
+class _BloomFilter:
+    """Ensemble probabiliste de taille fixe : aucun faux négatif, faux positifs rares"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        added = False
+        for position in self._positions(value):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        # Une valeur déjà présente (recouvrement des synchronisations) n'est pas recomptée
+        if added:
+            self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+class BlacklistFilter:
+    """
+    Filtre de Bloom en mémoire des JTI révoqués non expirés.
+
+    Un JTI absent du filtre n'est pas révoqué : le token est accepté sans
+    requête. Un JTI présent (révoqué ou faux positif) est confirmé par la
+    recherche indexée de SimpleJWT sur le JTI. La mémoire est bornée par la
+    taille du filtre, quel que soit le nombre de révocations.
+
+    Chaque révocation est ajoutée aussitôt au filtre du processus qui la
+    fait et incrémente une version partagée dans le cache. Quand elle
+    change, les autres processus ne relisent que les révocations
+    d'identifiant supérieur au dernier lu (à SYNC_ID_OVERLAP près) : avec la
+    rotation des refresh tokens, une requête sur un court intervalle de clé
+    primaire par rafraîchissement.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def contains(self, jti):
+        version = get_blacklist_version()
+        if version != self._version or self._needs_rebuild():
+            self._sync(version)
+        if jti not in self._bloom:
+            return False
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def add(self, jti):
+        """Ajoute une révocation faite par ce processus, sans attendre la synchronisation"""
+        bloom = self._bloom
+        if bloom is not None:
+            bloom.add(jti)
+
+    def clear(self):
+        with self._lock:
+            self._bloom = None
+            self._version = None
+            self._last_id = 0
+            self._loaded_at = 0
+
+    def _needs_rebuild(self):
+        return (
+            self._bloom is None
+            or self._bloom.full
+            or time.monotonic() - self._loaded_at > FULL_RELOAD_INTERVAL
+        )
+
+    def _sync(self, version):
+        with self._lock:
+            if version == self._version and not self._needs_rebuild():
+                return
+            if self._needs_rebuild():
+                rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+                bloom = _BloomFilter(max(FILTER_CAPACITY, 2 * rows.count()), FILTER_ERROR_RATE)
+                loaded_at = time.monotonic()
+            else:
+                rows = BlacklistedToken.objects.filter(id__gt=self._last_id - SYNC_ID_OVERLAP)
+                bloom = self._bloom
+                loaded_at = self._loaded_at
+
+            last_id = self._last_id
+            for row_id, jti in rows.order_by().values_list('id', 'token__jti').iterator():
+                bloom.add(jti)
+                last_id = max(last_id, row_id)
+
+            self._bloom = bloom
+            self._version = version
+            self._last_id = last_id
+            self._loaded_at = loaded_at
+
+blacklist_filter = BlacklistFilter()
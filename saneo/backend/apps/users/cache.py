@@ -0,0 +1,34 @@
+from apps.core.cache import bump_version, get_version
+
+# Durée de vie de l'utilisateur authentifié en cache (secondes)
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+# Champs de l'utilisateur mis en cache ; le mot de passe n'en fait jamais partie
+AUTH_USER_CACHED_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'phone_number',
+    'is_active', 'is_staff', 'is_superuser',
+    'notification_email', 'notification_expiry_days', 'created_at', 'updated_at',
+)
+
+BLACKLIST_VERSION_KEY = 'users:blacklist:version'
+
+def _version_key(user_id):
+    return f'users:auth:version:{user_id}'
+
+def get_auth_version(user_id):
+    """Version courante du compte d'un utilisateur"""
+    return get_version(_version_key(user_id))
+
+def bump_auth_version(user_id):
+    """Invalide l'utilisateur authentifié en cache (après commit)"""
+    bump_version(_version_key(user_id))
+
+def auth_user_cache_key(user_id):
+    return f'users:auth:user:{user_id}:{get_auth_version(user_id)}'
+
+def get_blacklist_version():
+    """Version courante de la liste noire des tokens"""
+    return get_version(BLACKLIST_VERSION_KEY)
+
+def bump_blacklist_version():
+    """Signale une nouvelle révocation aux autres processus (après commit)"""
+    bump_version(BLACKLIST_VERSION_KEY)
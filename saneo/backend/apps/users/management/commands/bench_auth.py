@@ -0,0 +1,68 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+from apps.users.authentication import CachedJWTAuthentication
+from apps.users.views import ProfileView
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark de l\'authentification JWT : requêtes/s sur le profil avec '
+        'la résolution de l\'utilisateur en base puis depuis le cache'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requêtes par mode')
+        parser.add_argument('--warmup', type=int, default=20, help='Requêtes de chauffe par mode')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(
+            username=f'bench_auth_{int(time.time())}',
+            email=f'bench_auth_{int(time.time())}@saneo.local',
+            password=None
+        )
+        try:
+            authorization = f'Bearer {RefreshToken.for_user(user).access_token}'
+
+            results = {}
+            for label, authentication_class in (
+                ('JWTAuthentication', JWTAuthentication),
+                ('CachedJWTAuthentication', CachedJWTAuthentication),
+            ):
+                view = ProfileView.as_view(authentication_classes=[authentication_class])
+                results[label] = self._measure(view, authorization, options)
+
+            self.stdout.write(f'{"Authentification":<26} {"req/s":>10} {"requêtes SQL/appel":>20}')
+            for label, (rate, queries) in results.items():
+                self.stdout.write(f'{label:<26} {rate:>10.1f} {queries:>20.2f}')
+
+            before = results['JWTAuthentication'][0]
+            after = results['CachedJWTAuthentication'][0]
+            self.stdout.write(self.style.SUCCESS(f'✓ Gain : {after / before:.2f}x'))
+        finally:
+            user.delete()
+
+    def _measure(self, view, authorization, options):
+        factory = APIRequestFactory()
+
+        def get_profile():
+            return view(factory.get('/api/v1/auth/profile/', HTTP_AUTHORIZATION=authorization))
+
+        for _ in range(options['warmup']):
+            get_profile()
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(options['requests']):
+                response = get_profile()
+                if response.status_code != 200:
+                    raise CommandError(f'Réponse inattendue : {response.status_code}')
+            elapsed = time.perf_counter() - started
+
+        return options['requests'] / elapsed, len(queries) / options['requests']
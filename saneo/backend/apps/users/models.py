@@ -21,5 +21,22 @@ class User(AbstractUser):
         verbose_name = "Utilisateur"
         verbose_name_plural = "Utilisateurs"
     
+    # Réglages qui déterminent les échéances de péremption des lots
+    EXPIRY_SETTINGS = ('notification_expiry_days', 'is_active')
+    
     def __str__(self):
         return self.username
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_expiry_settings()
+        return instance
+    
+    def expiry_settings(self):
+        """Réglages d'échéance chargés (un champ différé vaut None)"""
+        return tuple(self.__dict__.get(field) for field in self.EXPIRY_SETTINGS)
+    
+    def remember_expiry_settings(self):
+        """Mémorise les réglages d'échéance tels qu'en base, sans requête"""
+        self._loaded_expiry_settings = self.expiry_settings()
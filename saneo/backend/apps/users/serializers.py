@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from .tokens import RefreshToken
 
 User = get_user_model()
 
@@ -45,3 +47,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         if attrs['new_password'] != attrs['new_password2']:
             raise serializers.ValidationError({"new_password": "Les nouveaux mots de passe ne correspondent pas."})
         return attrs
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """Rafraîchissement du token avec vérification de révocation en mémoire"""
+    token_class = RefreshToken
@@ -0,0 +1,33 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from apps.core.cache import bump_user_generation
+from apps.stocks.models import ExpiryTimeline, StockBatch
+from .blacklist import blacklist_filter
+from .cache import bump_auth_version, bump_blacklist_version
+from .models import User
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_auth_cache_on_user_change(sender, instance, **kwargs):
+    bump_auth_version(instance.pk)
+
+@receiver(post_delete, sender=User)
+def invalidate_data_cache_on_user_delete(sender, instance, **kwargs):
+    """Une seule invalidation pour toutes les données supprimées en cascade"""
+    bump_user_generation(instance.pk)
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklist_filter_on_blacklist(sender, instance, created, **kwargs):
+    if created:
+        # Filtre local à jour immédiatement ; un rollback ne laisse qu'un faux positif, confirmé en base
+        blacklist_filter.add(instance.token.jti)
+        bump_blacklist_version()
+
+@receiver(post_save, sender=User)
+def reschedule_expiry_timeline_on_settings_change(sender, instance, created, **kwargs):
+    """Reprogramme les échéances des lots de l'utilisateur si ses réglages changent"""
+    previous = getattr(instance, '_loaded_expiry_settings', None)
+    instance.remember_expiry_settings()
+    if created or previous is None or previous == instance.expiry_settings():
+        return
+    ExpiryTimeline.objects.schedule(StockBatch.objects.filter(product__user=instance).values('pk'))
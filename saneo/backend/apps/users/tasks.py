@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+TOKEN_DELETE_CHUNK_SIZE = 1000
+
+@shared_task
+def prune_expired_tokens(chunk_size=TOKEN_DELETE_CHUNK_SIZE):
+    """
+    Tâche quotidienne de purge des tokens expirés (et de leur révocation)
+    par suppressions successives de taille bornée
+    """
+    now = timezone.now()
+    expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by().values_list('id', flat=True)
+    deleted = 0
+
+    while True:
+        ids = list(expired[:chunk_size])
+        if not ids:
+            break
+        # La suppression en cascade emporte les BlacklistedToken associés
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+
+    return f"{deleted} token(s) expiré(s) supprimé(s)"
@@ -0,0 +1,205 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.users.blacklist import SYNC_ID_OVERLAP, BlacklistFilter, _BloomFilter, blacklist_filter
+from apps.users.cache import auth_user_cache_key
+from apps.users.tasks import prune_expired_tokens
+from apps.users.tokens import RefreshToken
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='auth_tester',
+            email='auth_tester@example.com',
+            password='StrongPass123!',
+            first_name='Alice'
+        )
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_user_is_resolved_from_cache_after_first_request(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'auth_tester')
+
+    def test_password_hash_is_not_cached(self):
+        self.client.get('/api/v1/auth/profile/')
+
+        cached = cache.get(auth_user_cache_key(self.user.pk))
+        self.assertEqual(cached['username'], 'auth_tester')
+        self.assertNotIn('password', cached)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/v1/auth/profile/', {'first_name': 'Bob'}, format='json')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('StrongPass123!'))
+
+    def test_profile_update_invalidates_cached_user(self):
+        self.client.get('/api/v1/auth/profile/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/v1/auth/profile/', {'first_name': 'Bob'}, format='json')
+
+        response = self.client.get('/api/v1/auth/profile/')
+        self.assertEqual(response.data['first_name'], 'Bob')
+
+    def test_password_change_invalidates_cached_user(self):
+        self.client.get('/api/v1/auth/profile/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/api/v1/auth/change-password/', {
+                'old_password': 'StrongPass123!',
+                'new_password': 'NewStrongPass456!',
+                'new_password2': 'NewStrongPass456!',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        # L'ancien mot de passe en cache serait à nouveau accepté
+        response = self.client.put('/api/v1/auth/change-password/', {
+            'old_password': 'StrongPass123!',
+            'new_password': 'OtherStrongPass789!',
+            'new_password2': 'OtherStrongPass789!',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/v1/auth/profile/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        response = self.client.get('/api/v1/auth/profile/')
+        self.assertEqual(response.status_code, 401)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.clear()
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(
+            username='blacklist_tester',
+            email='blacklist_tester@example.com',
+            password='StrongPass123!'
+        )
+        self.client = APIClient()
+
+    def _login(self):
+        response = self.client.post('/api/v1/auth/login/', {
+            'username': 'blacklist_tester',
+            'password': 'StrongPass123!',
+        }, format='json')
+        return response.data['refresh'], response.data['access']
+
+    def test_rotated_refresh_token_cannot_be_reused(self):
+        refresh, _ = self._login()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], refresh)
+
+        response = self.client.post('/api/v1/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_blacklists_refresh_token(self):
+        refresh, access = self._login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/auth/logout/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=RefreshToken(refresh, verify=False)['jti']).exists())
+
+        response = self.client.post('/api/v1/auth/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_blacklist_check_skips_database_until_a_new_revocation(self):
+        revoked = RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoked.blacklist()
+        valid = str(RefreshToken.for_user(self.user))
+
+        # Construction du filtre : comptage et lecture des JTI révoqués
+        with self.assertNumQueries(2):
+            RefreshToken(valid)
+        with self.assertNumQueries(0):
+            RefreshToken(valid)
+        # Un JTI présent dans le filtre est confirmé en base
+        with self.assertNumQueries(1):
+            with self.assertRaises(TokenError):
+                RefreshToken(str(revoked))
+
+    def test_rotation_is_synced_by_primary_key_range(self):
+        other_process = BlacklistFilter()
+        first, _ = self._login()
+        other_process.contains('warmup')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/auth/refresh/', {'refresh': first}, format='json')
+        second = response.data['refresh']
+        with self.captureOnCommitCallbacks(execute=True):
+            third = self.client.post('/api/v1/auth/refresh/', {'refresh': second}, format='json').data['refresh']
+
+        jti = RefreshToken(first, verify=False)['jti']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(other_process.contains(jti))
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"id" >', queries[0]['sql'])
+
+        self.assertTrue(other_process.contains(RefreshToken(second, verify=False)['jti']))
+        with self.assertNumQueries(0):
+            self.assertFalse(other_process.contains(RefreshToken(third, verify=False)['jti']))
+
+    def test_revocation_is_synced_without_rereading_older_rows(self):
+        for _ in range(SYNC_ID_OVERLAP + 30):
+            RefreshToken.for_user(self.user).blacklist()
+        other_process = BlacklistFilter()
+        other_process.contains('warmup')
+        blacklist_filter.contains('warmup')
+
+        revoked = RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            revoked.blacklist()
+        # Le processus qui révoque voit la révocation sans attendre la synchronisation
+        self.assertIn(revoked['jti'], blacklist_filter._bloom)
+
+        with mock.patch.object(_BloomFilter, 'add', autospec=True) as add:
+            with self.assertNumQueries(1):
+                self.assertFalse(other_process.contains('unknown'))
+        self.assertLessEqual(add.call_count, SYNC_ID_OVERLAP + 1)
+        self.assertIn(mock.call(other_process._bloom, revoked['jti']), add.call_args_list)
+
+    def test_prune_deletes_expired_tokens_in_chunks(self):
+        now = timezone.now()
+        expired = [
+            OutstandingToken.objects.create(jti=f'expired-{i}', token='x', expires_at=now - timedelta(days=1))
+            for i in range(5)
+        ]
+        BlacklistedToken.objects.create(token=expired[0])
+        alive = OutstandingToken.objects.create(jti='alive', token='x', expires_at=now + timedelta(days=1))
+        BlacklistedToken.objects.create(token=alive)
+
+        self.assertEqual(prune_expired_tokens(chunk_size=2), "5 token(s) expiré(s) supprimé(s)")
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['alive'])
+        self.assertEqual(BlacklistedToken.objects.get().token, alive)
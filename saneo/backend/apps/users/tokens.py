@@ -0,0 +1,12 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from .blacklist import blacklist_filter
+
+class RefreshToken(BaseRefreshToken):
+    """Refresh token dont la vérification de révocation passe par le filtre en mémoire"""
+
+    def check_blacklist(self):
+        if blacklist_filter.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
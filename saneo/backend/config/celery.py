@@ -18,6 +18,14 @@ app.conf.beat_schedule = {
         'task': 'apps.shopping.tasks.generate_monthly_shopping_list',
         'schedule': crontab(day_of_month=1, hour=9, minute=0),  # 1er du mois à 9h
     },
+    'deliver-notification-outbox': {
+        'task': 'apps.notifications.tasks.deliver_outbox',
+        'schedule': crontab(),  # Toutes les minutes
+    },
+    'prune-expired-tokens-daily': {
+        'task': 'apps.users.tasks.prune_expired_tokens',
+        'schedule': crontab(hour=3, minute=30),  # Tous les jours à 3h30
+    },
 }
 
 @app.task(bind=True)